@@ -1,59 +1,25 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # 使用Agg后端，不需要GUI
-import matplotlib.pyplot as plt
-import numpy as np
+from tkinter import messagebox, ttk
 import os
-from PIL import Image, ImageTk
-import pynimate as nim
-import platform
-from matplotlib.font_manager import FontProperties
+# 启动时只导入轻量模块，pandas、matplotlib、PIL 在后台加载（见 exceltorace.startup）
+from exceltorace.app import RenderApp
+from exceltorace.options import AGGREGATIONS, FORMATS, SHEET_MODES
 
-class GDPAnimationApp:
+class GDPAnimationApp(RenderApp):
     def __init__(self, root):
-        self.root = root
+        # 任务排队、实时预览和性能统计由 RenderApp 处理
+        super().__init__(root, 'basic', os.path.basename(__file__))
         self.root.title("GDP排名动画生成器")
         self.root.geometry("800x600")
         self.root.configure(bg="#f0f0f0")
         
-        self.excel_path = None
         self.output_path = "output_animation.gif"
         self.static_output_path = "output_static.png"
         
-        # 设置中文字体
-        self.setup_fonts()
-        
         self.create_widgets()
         
-    def setup_fonts(self):
-        """设置适合当前操作系统的中文字体"""
-        system = platform.system()
-        
-        if system == 'Windows':
-            font_names = ['SimHei', 'Microsoft YaHei', 'SimSun']
-        elif system == 'Darwin':  # macOS
-            font_names = ['PingFang SC', 'Heiti SC', 'STHeiti', 'Arial Unicode MS']
-        else:  # Linux and others
-            font_names = ['WenQuanYi Zen Hei', 'WenQuanYi Micro Hei', 'Droid Sans Fallback']
-        
-        # 设置matplotlib全局字体
-        for font_name in font_names:
-            try:
-                plt.rcParams['font.sans-serif'] = [font_name] + plt.rcParams['font.sans-serif']
-                matplotlib.rcParams['font.family'] = 'sans-serif'
-                matplotlib.rcParams['axes.unicode_minus'] = False
-                # 测试字体是否支持中文
-                fig, ax = plt.subplots()
-                ax.set_title("测试")
-                plt.close(fig)
-                print(f"使用字体: {font_name}")
-                return
-            except:
-                continue
-        
-        print("警告: 未找到支持中文的字体，可能导致图表中文显示为乱码")
+        # 后台渲染线程，界面通过 root.after 轮询其事件
+        self.start_worker()
         
     def create_widgets(self):
         # 设置适合显示中文的字体
@@ -100,6 +66,25 @@ class GDPAnimationApp:
         self.output_var = tk.StringVar(value="output_animation")
         tk.Entry(settings_frame, textvariable=self.output_var, width=30, font=default_font).grid(row=2, column=1, padx=10, pady=10, sticky='w')
         
+        # 输出格式设置
+        tk.Label(settings_frame, text="输出格式:", font=default_font, bg="#f0f0f0").grid(row=3, column=0, padx=10, pady=10, sticky='w')
+        self.format_var = tk.StringVar(value="gif")
+        ttk.Combobox(settings_frame, textvariable=self.format_var, values=FORMATS, state='readonly', width=6).grid(row=3, column=1, padx=10, pady=10, sticky='w')
+        
+        # 重复的 (年份, 类别) 行的合并方式
+        tk.Label(settings_frame, text="重复行合并:", font=default_font, bg="#f0f0f0").grid(row=4, column=0, padx=10, pady=10, sticky='w')
+        self.aggregate_var = tk.StringVar(value=AGGREGATIONS['sum'])
+        ttk.Combobox(settings_frame, textvariable=self.aggregate_var, values=list(AGGREGATIONS.values()), state='readonly', width=8).grid(row=4, column=1, padx=10, pady=10, sticky='w')
+        
+        # 工作簿有多个工作表时的处理方式
+        tk.Label(settings_frame, text="多工作表:", font=default_font, bg="#f0f0f0").grid(row=5, column=0, padx=10, pady=10, sticky='w')
+        self.sheets_var = tk.StringVar(value=SHEET_MODES['auto'])
+        ttk.Combobox(settings_frame, textvariable=self.sheets_var, values=list(SHEET_MODES.values()), state='readonly', width=8).grid(row=5, column=1, padx=10, pady=10, sticky='w')
+        
+        # 性能分析设置
+        self.cprofile_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(settings_frame, text="保存cProfile性能分析", variable=self.cprofile_var, font=default_font, bg="#f0f0f0").grid(row=6, column=0, columnspan=2, padx=10, pady=10, sticky='w')
+        
         # 操作按钮
         button_frame = tk.Frame(main_frame, bg="#f0f0f0")
         button_frame.pack(fill=tk.X, pady=20)
@@ -110,6 +95,18 @@ class GDPAnimationApp:
                                    width=15, height=2, font=('SimHei', 12))
         generate_button.pack(pady=10)
         
+        cancel_button = tk.Button(button_frame, text="取消任务", 
+                                 command=self.cancel_animation, 
+                                 bg="#9E9E9E", fg="white",
+                                 width=10, font=('SimHei', 10))
+        cancel_button.pack()
+        
+        cancel_all_button = tk.Button(button_frame, text="取消全部", 
+                                     command=self.cancel_all_animations, 
+                                     bg="#9E9E9E", fg="white",
+                                     width=10, font=('SimHei', 10))
+        cancel_all_button.pack(pady=(5, 0))
+        
         # 状态显示
         status_frame = tk.LabelFrame(main_frame, text="状态", font=('SimHei', 12), bg="#f0f0f0")
         status_frame.pack(fill=tk.X, pady=10)
@@ -129,215 +126,19 @@ class GDPAnimationApp:
         self.preview_label = tk.Label(main_frame, bg="#e0e0e0", height=10)
         self.preview_label.pack(fill=tk.X, padx=20, pady=10)
         
-    def browse_file(self):
-        """打开文件选择对话框"""
-        file_path = filedialog.askopenfilename(
-            title="选择Excel文件",
-            filetypes=[("Excel文件", "*.xlsx *.xls")]
-        )
-        
-        if file_path:
-            self.excel_path = file_path
-            self.file_label.config(text=os.path.basename(file_path))
-            self.status_var.set(f"已选择文件: {os.path.basename(file_path)}")
-            self.validate_excel()
-            
-    def validate_excel(self):
-        """验证Excel文件格式是否正确"""
-        try:
-            df = pd.read_excel(self.excel_path)
-            
-            # 检查列数
-            if len(df.columns) < 3:
-                self.status_var.set("错误: Excel文件应至少包含3列 (年份、国家/类别、数值)")
-                return False
-                
-            # 尝试识别列名
-            self.status_var.set(f"文件有效。列名: {', '.join(df.columns[:3])}")
-            return True
-            
-        except Exception as e:
-            self.status_var.set(f"验证Excel时出错: {str(e)}")
-            return False
-    
-    def generate_animation(self):
-        """生成动画"""
-        if not self.excel_path:
-            messagebox.showerror("错误", "请先选择Excel文件")
-            return
-            
-        try:
-            self.status_var.set("正在读取Excel数据...")
-            self.progress["value"] = 10
-            self.root.update()
-            
-            # 读取Excel
-            df = pd.read_excel(self.excel_path)
-            
-            # 确保列名正确
-            if len(df.columns) >= 3:
-                # 重命名前三列为标准名称
-                column_names = list(df.columns)
-                df = df.rename(columns={
-                    column_names[0]: "year",
-                    column_names[1]: "country",
-                    column_names[2]: "gdp"
-                })
-            else:
-                raise ValueError("Excel文件格式不正确，需要至少3列数据")
-                
-            self.status_var.set("正在处理数据...")
-            self.progress["value"] = 30
-            self.root.update()
-            
-            # 确保年份是数字类型
-            df['year'] = pd.to_numeric(df['year'], errors='coerce')
-            df = df.dropna(subset=['year'])
-            df['year'] = df['year'].astype(int)
-            
-            # 确保GDP是数字
-            df['gdp'] = pd.to_numeric(df['gdp'], errors='coerce')
-            df = df.dropna(subset=['gdp'])
-            
-            # 为动画重新整理数据
-            self.status_var.set("正在准备动画数据...")
-            self.progress["value"] = 50
-            self.root.update()
-            
-            output_filename = self.output_var.get()
-            
-            try:
-                # 尝试使用pynimate创建动画
-                self.create_animation_with_pynimate(df, output_filename)
-            except Exception as e:
-                self.status_var.set(f"创建动画失败，正在创建静态图表: {str(e)}")
-                self.progress["value"] = 70
-                self.root.update()
-                
-                # 备选方案：创建静态图表
-                self.create_static_charts(df, output_filename)
-                
-        except Exception as e:
-            self.status_var.set(f"处理过程中出错: {str(e)}")
-            messagebox.showerror("错误", f"生成动画失败: {str(e)}")
-            self.progress["value"] = 0
-            
-    def create_animation_with_pynimate(self, df, output_filename):
-        """使用pynimate创建动态条形图"""
-        # 数据预处理
-        df_pivot = df.pivot(index='year', columns='country', values='gdp').fillna(0)
-        
-        # 创建Canvas和BarDatafier对象
-        cnv = nim.Canvas(figsize=(15, 8))
-        
-        # 确保图表使用正确的中文字体
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun'] + plt.rcParams['font.sans-serif']
-        plt.rcParams['axes.unicode_minus'] = False
-        
-        datafier = nim.BarDatafier(
-            df_pivot,
-            time_format="%Y",
-            ip_freq="YE"
-        )
-        
-        # 创建Barhplot对象
-        bar = nim.Barhplot(datafier)
-        
-        # 设置时间标签回调函数
-        bar.set_time(callback=lambda i, datafier: f"{datafier.data.index[i].year}年")
-        
-        # 设置标题
-        bar.set_title(self.title_var.get())
-        
-        # 设置标签
-        bar.set_xlabel('数值')
-        
-        # 添加到Canvas并创建动画
-        cnv.add_plot(bar)
-        cnv.animate()
-        
-        # 保存动画
-        gif_path = f"{output_filename}.gif"
-        cnv.save(gif_path, fps=self.fps_var.get())
-        
-        self.status_var.set(f"动画已创建并保存为 {gif_path}")
-        self.progress["value"] = 100
-        
-        # 显示成功消息
-        messagebox.showinfo("成功", f"动画已保存为 {gif_path}")
-        
-        # 预览第一帧
-        self.show_preview(gif_path)
-        
-    def create_static_charts(self, df, output_filename):
-        """创建静态图表作为备选方案"""
-        # 获取所有不同的年份
-        years = sorted(df['year'].unique())
-        
-        # 重新设置字体以确保中文显示正确
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun']
-        plt.rcParams['axes.unicode_minus'] = False
-        
-        # 为每一年创建一个条形图
-        fig, axes = plt.subplots(len(years), 1, figsize=(12, 5*len(years)))
-        fig.suptitle(self.title_var.get(), fontsize=16)
-        
-        # 如果只有一年数据，确保axes是可迭代的
-        if len(years) == 1:
-            axes = [axes]
-        
-        for i, year in enumerate(years):
-            # 筛选当年数据并排序
-            year_data = df[df['year'] == year].sort_values('gdp', ascending=False).head(10)
-            
-            # 创建水平条形图
-            bars = axes[i].barh(year_data['country'][::-1], year_data['gdp'][::-1])
-            
-            # 添加数值标签
-            for bar in bars:
-                width = bar.get_width()
-                axes[i].text(width + (width*0.02), bar.get_y() + bar.get_height()/2, 
-                            f'{width:,.0f}', ha='left', va='center')
-            
-            # 设置标题和标签
-            axes[i].set_title(f'{int(year)}年', fontsize=14)
-            axes[i].set_xlabel('数值', fontsize=12)
-            
-        plt.tight_layout(rect=[0, 0, 1, 0.96])
-        
-        static_path = f"{output_filename}_static.png"
-        plt.savefig(static_path)
-        plt.close()
+    def show_animation_result(self, result):
+        """显示动画生成结果"""
+        animation_path = result['path']
         
-        self.status_var.set(f"静态图表已保存为 {static_path}")
+        self.status_var.set(f"动画已创建并保存为 {animation_path}")
         self.progress["value"] = 100
         
         # 显示成功消息
-        messagebox.showinfo("成功", f"静态图表已保存为 {static_path}")
+        messagebox.showinfo("成功", f"动画已保存为 {animation_path}")
         
-        # 预览图表
-        self.show_preview(static_path)
-    
-    def show_preview(self, image_path):
-        """在UI中显示图像预览"""
-        try:
-            # 打开图像
-            img = Image.open(image_path)
-            
-            # 调整大小以适应预览区域
-            width = 700
-            ratio = width / img.width
-            height = int(img.height * ratio)
-            
-            img = img.resize((width, height), Image.LANCZOS)
-            
-            # 显示图像
-            photo = ImageTk.PhotoImage(img)
-            self.preview_label.config(image=photo)
-            self.preview_label.image = photo  # 保持引用，防止被垃圾回收
-            
-        except Exception as e:
-            self.status_var.set(f"无法预览图像: {str(e)}")
+        # 预览第一帧（渲染时已生成缩略图，视频格式同样可以预览）
+        with result['profile'].stage('preview'):
+            self.show_preview(result)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,30 @@
+"""ExcelToRace 渲染核心，可脱离 Tk 界面使用
+
+下列公开函数在第一次访问时才导入所在的模块：只用到 worker、options 等轻量模块时
+（如图形界面启动时）不会加载 pandas 和 matplotlib。
+"""
+import importlib
+
+_EXPORTS = {
+    'WorkbookCache': 'data',
+    'clean_frame': 'data',
+    'load_data': 'data',
+    'validate_file': 'data',
+    'validate_frame': 'data',
+    'workbook_cache': 'data',
+    'create_animation': 'render',
+    'create_static_charts': 'render',
+    'create_year_pngs': 'render',
+    'render_dataframe': 'render',
+    'render_file': 'render',
+    'setup_fonts': 'fonts',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{module}", __name__), name)
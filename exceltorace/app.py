@@ -0,0 +1,245 @@
+"""两个图形界面（excel_to_race.py、excel_to_race_pro.py）共用的任务管理
+
+RenderApp 负责选择和检查数据文件、把渲染任务交给后台线程排队执行、轮询其事件、
+播放实时预览、显示缩略图和性能统计。界面只需创建控件并实现 show_animation_result。
+本模块只依赖 tkinter 和 exceltorace 的轻量模块，界面启动时导入不会加载 pandas 和 matplotlib。
+"""
+import io
+import os
+import queue
+from tkinter import filedialog, messagebox
+
+from . import startup
+from .live import LiveFrames
+from .options import AGGREGATIONS, SHEET_MODES
+from .profiling import PROFILE_LOG, Profiler
+from .worker import RenderWorker
+
+
+class RenderApp:
+    """图形界面的公共部分
+
+    子类在 create_widgets 中创建以下控件：status_var、progress、preview_label、file_label，
+    以及设置项 output_var、format_var、title_var、fps_var、aggregate_var、sheets_var、cprofile_var；
+    创建完成后调用 start_worker()。render_style 为 render_file 的 style（basic/pro）。
+    """
+
+    def __init__(self, root, render_style, script):
+        self.root = root
+        self.render_style = render_style
+        # 启动性能日志中记录的界面脚本名
+        self.script = script
+        self.excel_path = None
+
+        # 渲染模块和中文字体在后台加载，窗口先显示
+        self.warmup = startup.Warmup()
+        self.startup_logged = False
+
+        # 各任务的实时预览缓冲区，self.live 为正在播放的一个
+        self.live_previews = {}
+        self.live = None
+
+    def start_worker(self):
+        """启动后台渲染线程，界面通过 root.after 轮询其事件"""
+        self.worker = RenderWorker()
+        self.root.after(100, self.poll_worker)
+        self.warmup.mark_interactive(self.root, self.show_startup_time)
+
+    def browse_file(self):
+        """打开文件选择对话框"""
+        file_path = filedialog.askopenfilename(
+            title="选择数据文件",
+            filetypes=[("数据文件", "*.xlsx *.xls *.csv *.tsv *.csv.gz *.tsv.gz"),
+                       ("Excel文件", "*.xlsx *.xls"),
+                       ("CSV/TSV文件", "*.csv *.tsv *.csv.gz *.tsv.gz")]
+        )
+
+        if file_path:
+            self.excel_path = file_path
+            self.file_label.config(text=os.path.basename(file_path))
+            self.status_var.set(f"已选择文件: {os.path.basename(file_path)}")
+            self.validate_excel()
+
+    def selected_sheets(self):
+        """当前选择的多工作表处理方式（SHEET_MODES 的键）"""
+        return {name: key for key, name in SHEET_MODES.items()}[self.sheets_var.get()]
+
+    def validate_excel(self):
+        """验证数据文件格式是否正确"""
+        from . import data
+        valid, message = data.validate_file(self.excel_path, sheets=self.selected_sheets())
+        self.status_var.set(message)
+        return valid
+
+    def generate_animation(self):
+        """生成动画（在后台线程中排队执行）"""
+        if not self.excel_path:
+            messagebox.showerror("错误", "请先选择Excel文件")
+            return
+
+        # 在界面线程中读取设置，后台线程不访问Tk变量
+        excel_path = self.excel_path
+        output_filename = self.output_var.get()
+        fmt = self.format_var.get()
+        title = self.title_var.get()
+        fps = self.fps_var.get()
+        style = self.render_style
+        aggregate = {name: key for key, name in AGGREGATIONS.items()}[self.aggregate_var.get()]
+        sheets = self.selected_sheets()
+        profiler = Profiler(f"{output_filename}.prof" if self.cprofile_var.get() else None)
+
+        warmup = self.warmup
+        live = LiveFrames()
+
+        def run(report):
+            # 首次渲染前等待后台加载完成（中文字体设置好之后才能绘图）
+            warmup.wait()
+            from . import render
+            return render.render_file(excel_path, output_filename, title, fps, style, report,
+                                      profiler=profiler, aggregate=aggregate, sheets=sheets, fmt=fmt,
+                                      live_preview=live)
+
+        job = self.worker.submit(os.path.basename(excel_path), run)
+        self.live_previews[job.id] = live
+
+        if self.worker.current is not None or self.worker.pending > 1:
+            self.status_var.set(f"已加入队列: {job.name}（排队中 {self.worker.pending} 个任务）")
+
+    def cancel_animation(self):
+        """取消正在执行的渲染任务"""
+        job = self.worker.cancel()
+        if job is not None:
+            self.status_var.set(f"正在取消: {job.name}...")
+
+    def cancel_all_animations(self):
+        """取消正在执行和排队中的全部渲染任务"""
+        count = self.worker.cancel_all()
+        if count:
+            self.status_var.set(f"正在取消全部 {count} 个任务...")
+
+    def poll_worker(self):
+        """读取后台渲染线程的事件并更新界面"""
+        try:
+            while True:
+                kind, job, payload = self.worker.events.get_nowait()
+                if kind in ('done', 'cancelled', 'error'):
+                    self.stop_live_preview(job)
+
+                if kind == 'started':
+                    self.status_var.set(f"开始处理: {job.name}")
+                    self.progress["value"] = 0
+                    self.start_live_preview(job)
+                elif kind == 'progress':
+                    message, value = payload
+                    self.status_var.set(message)
+                    if value is not None:
+                        self.progress["value"] = value
+                elif kind == 'done':
+                    if payload['kind'] == 'animation':
+                        self.show_animation_result(payload)
+                    else:
+                        self.show_static_result(payload)
+                    self.show_profile(job, payload)
+                elif kind == 'cancelled':
+                    self.status_var.set(f"已取消: {job.name}")
+                    self.progress["value"] = 0
+                elif kind == 'error':
+                    self.status_var.set(f"处理过程中出错: {str(payload)}")
+                    messagebox.showerror("错误", f"生成动画失败: {str(payload)}")
+                    self.progress["value"] = 0
+        except queue.Empty:
+            pass
+
+        self.check_warmup()
+        self.root.after(100, self.poll_worker)
+
+    def start_live_preview(self, job):
+        """开始播放任务渲染中的帧，发现标题或列设置有误时可以立即取消"""
+        self.live = self.live_previews.pop(job.id, None)
+        if self.live is not None:
+            self.play_live_preview(self.live)
+
+    def stop_live_preview(self, job):
+        """任务结束后停止播放，画面停在最后显示的一帧"""
+        # 排队中被取消的任务尚未开始播放，只需丢弃其缓冲区
+        if self.live_previews.pop(job.id, None) is None:
+            self.live = None
+
+    def play_live_preview(self, live):
+        """按缓冲区的刷新率每次显示一帧，渲染结束后不再重新调度"""
+        if live is not self.live:
+            return
+        item = live.pop()
+        if item is not None:
+            from PIL import Image, ImageTk
+            index, size, data = item
+            photo = ImageTk.PhotoImage(Image.frombuffer('RGB', size, data, 'raw', 'RGB', 0, 1))
+            self.preview_label.config(image=photo)
+            self.preview_label.image = photo  # 保持引用，防止被垃圾回收
+        self.root.after(live.interval_ms, self.play_live_preview, live)
+
+    def show_animation_result(self, result):
+        """显示动画的生成结果，由各界面实现"""
+        raise NotImplementedError
+
+    def show_static_result(self, result):
+        """显示静态图表（动画失败时的备选方案）的生成结果"""
+        static_path = result['path']
+        pages = result['pages']
+
+        if len(pages) > 1:
+            message = f"静态图表已分 {len(pages)} 页保存为 {pages[0]} 等文件"
+        else:
+            message = f"静态图表已保存为 {static_path}"
+        self.status_var.set(message)
+        self.progress["value"] = 100
+
+        # 显示成功消息
+        messagebox.showinfo("成功", message)
+
+        # 预览图表（第一页）
+        with result['profile'].stage('preview'):
+            self.show_preview(result)
+
+    def show_startup_time(self, seconds):
+        """窗口可以操作时在状态栏显示启动耗时"""
+        self.status_var.set(f"等待操作...（启动用时 {seconds:.2f}s，渲染模块在后台加载中）")
+
+    def check_warmup(self):
+        """后台加载完成后显示其耗时，并把启动性能追加到性能日志"""
+        if self.startup_logged or not self.warmup.done or self.warmup.interactive is None:
+            return
+        self.startup_logged = True
+        profile = self.warmup.profile
+        if self.status_var.get().startswith("等待操作..."):
+            loaded = sum(record['wall'] for record in profile.stages if record['stage'] == 'warmup')
+            self.status_var.set(f"等待操作...（启动用时 {self.warmup.interactive:.2f}s，后台加载 {loaded:.2f}s）")
+        try:
+            profile.append_log(PROFILE_LOG, input=self.script, kind='startup')
+        except OSError:
+            pass
+
+    def show_profile(self, job, result):
+        """在状态栏显示各阶段的耗时和内存，并追加到性能日志"""
+        profile = result['profile']
+        self.status_var.set(f"{self.status_var.get()}\n{profile.summary()}")
+        try:
+            profile.append_log(PROFILE_LOG, input=job.name, output=result['path'], kind=result['kind'])
+        except OSError:
+            pass
+
+    def show_preview(self, result):
+        """在UI中显示渲染时生成的缩略图（不再打开完整的输出文件）"""
+        if not result.get('preview'):
+            return
+        from PIL import Image, ImageTk
+        try:
+            img = Image.open(io.BytesIO(result['preview']))
+
+            # 显示图像
+            photo = ImageTk.PhotoImage(img)
+            self.preview_label.config(image=photo)
+            self.preview_label.image = photo  # 保持引用，防止被垃圾回收
+
+        except Exception as e:
+            self.status_var.set(f"无法预览图像: {str(e)}")
@@ -0,0 +1,414 @@
+"""基于matplotlib的条形图赛跑渲染引擎
+
+与 pynimate 逐帧重绘整张图不同，这里只创建一次图表和一组条形/文字对象：
+插值后的数值和排名位置预先以 NumPy 数组一次算好，每帧只更新可见条形的宽度、
+位置和文字，并在缓存的背景上重绘（blitting），因此每帧耗时与实体数和帧数无关。
+"""
+import zlib
+
+import matplotlib
+import numpy as np
+import pandas as pd
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .data import period_labels
+from .encoders import open_writer
+from .fonts import font_state
+from .framecache import segment_key
+from .sparse import SparseFrame
+
+
+def _smoothstep(t):
+    return t * t * (3 - 2 * t)
+
+
+def _cubic(t):
+    return np.where(t < 0.5, 4 * t ** 3, 1 - (-2 * t + 2) ** 3 / 2)
+
+
+def _sine(t):
+    return (1 - np.cos(np.pi * t)) / 2
+
+
+# 区段内插值比例的缓动函数（输入输出均为 0~1）
+EASINGS = {
+    'linear': lambda t: t,
+    'smoothstep': _smoothstep,
+    'cubic': _cubic,
+    'sine': _sine,
+}
+
+# datetime 时间轴换算为以年为单位的数值
+_NS_PER_YEAR = 365.2425 * 24 * 3600 * 1e9
+
+# 动画帧数上限：时间轴的单位过小（如时间戳、yyyymmdd 形式的数字）时避免生成天文数字的帧
+MAX_FRAMES = 20000
+
+
+def period_times(index):
+    """把透视表的索引换算为数值时间：数字原样使用，日期换算为带小数的年份"""
+    if isinstance(index, pd.PeriodIndex):
+        index = index.to_timestamp()
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8 / _NS_PER_YEAR + 1970
+    return np.asarray(index, dtype=float)
+
+
+def _period_ranks(values):
+    # 每个时期内的排名（按原始精度排序）和排序后的实体顺序
+    order = np.argsort(-values, axis=1, kind='stable')
+    ranks = np.empty(values.shape, dtype=np.int64)
+    np.put_along_axis(ranks, order, np.arange(values.shape[1])[None, :], axis=1)
+    return order, ranks
+
+
+# 坐标轴上限取 NICE_STEPS × 10^k 中不小于所需值的最小者，数据追加一年时通常不变，帧缓存仍然有效
+NICE_STEPS = (1, 1.5, 2, 3, 4, 5, 6, 8, 10)
+
+
+def nice_ceiling(x):
+    """不小于 x 的“整齐”数值（1、1.5、2、3、4、5、6、8 乘以10的幂）"""
+    if not np.isfinite(x) or x <= 0:
+        return 1.0
+    scale = 10.0 ** np.floor(np.log10(x))
+    return float(next(step * scale for step in NICE_STEPS if step * scale >= x * (1 - 1e-12)))
+
+
+def color_index(name, n_colors=20):
+    """实体的颜色编号，只由名称决定：增删其他实体时已有条形的颜色不变"""
+    return zlib.crc32(name.encode('utf-8')) % n_colors
+
+
+def _check_frame_count(n_frames):
+    if n_frames > MAX_FRAMES:
+        raise ValueError(f"动画共需 {n_frames:.0f} 帧，超过上限 {MAX_FRAMES}：请减小每单位的帧数，"
+                         f"或改为按时期插值（--per-period）")
+
+
+def _frame_schedule(times, steps_per_unit, easing, per_period):
+    """每帧的时间、所在区段（起止时期的行号）和缓动后的插值比例；总帧数超过 MAX_FRAMES 时抛出 ValueError
+
+    按时间均匀取帧时，帧间隔大于最短的时期间隔（如逐月数据每年只有几帧，或各月天数不同）
+    会跳过某些时期；这时改为按时期插值，总帧数大致不变，每个时期都有一帧正好落在其上。
+    """
+    if len(times) == 1:
+        zeros = np.zeros(1, dtype=int)
+        return times, zeros, zeros, np.zeros(1)
+
+    if not per_period:
+        n_frames = round((times[-1] - times[0]) * steps_per_unit) + 1
+        _check_frame_count(n_frames)
+        step = (times[-1] - times[0]) / max(n_frames - 1, 1)
+        if step > np.diff(times).min() * (1 + 1e-9):
+            per_period = True
+            steps_per_unit = max(round((n_frames - 1) / (len(times) - 1)), 1)
+
+    if per_period:
+        steps = max(int(steps_per_unit), 1)
+        _check_frame_count((len(times) - 1) * steps + 1)
+        segment = np.append(np.repeat(np.arange(len(times) - 1), steps), len(times) - 2)
+        frac = np.append(np.tile(np.arange(steps) / steps, len(times) - 1), 1.0)
+        frame_times = times[segment] + (times[segment + 1] - times[segment]) * frac
+    else:
+        frame_times = np.linspace(times[0], times[-1], int(n_frames))
+
+        # 一次性计算所有帧所在的区间和插值比例
+        segment = np.clip(np.searchsorted(times, frame_times, side='right') - 1, 0, len(times) - 2)
+        frac = (frame_times - times[segment]) / (times[segment + 1] - times[segment])
+    return frame_times, segment, segment + 1, EASINGS[easing](frac)
+
+
+class _DenseSource:
+    """稠密透视表的按时期查询，与 SparseFrame 的 top/lookup 接口相同"""
+
+    def __init__(self, df_pivot):
+        self.index = df_pivot.index
+        self.n_entities = df_pivot.shape[1]
+        self._values = np.asarray(df_pivot.to_numpy(), dtype=float)
+        self._order, self._ranks = _period_ranks(self._values)
+
+    def top(self, k, keep):
+        return self._order[k, :keep]
+
+    def lookup(self, k, codes):
+        return self._values[k, codes], self._ranks[k, codes]
+
+
+def interpolate_top_n(df_pivot, n, steps_per_unit=1, easing='linear', per_period=False, margin=1,
+                      dtype=np.float32):
+    """只为可能进入前 n 名的实体插值，返回 (frame_times, entities, values, positions)
+
+    排名位置在相邻两个时期的名次之间变化，因此区段内可见的实体必定在起点或终点时期排进前 n 名；
+    每个区段只取这些实体（再多留 margin 名作为余量），数组宽度与实体总数无关。
+    df_pivot 可以是透视表，也可以是 SparseFrame（不需要生成 时期数 × 实体数 的稠密数组）。
+    默认时间轴按索引的数值均匀取帧，每个时间单位（如一年）steps_per_unit 帧；
+    per_period 为真时改为每个时期（相邻两行之间）steps_per_unit 帧，适合间隔不均匀的月度、季度数据。
+    easing 为 EASINGS 中的缓动函数名，同时作用于数值和排名位置。
+    entities 为每帧各槽位对应的实体列号（空槽为 -1，其位置为 inf），values/positions 与之一一对应：
+    positions 为排名位置（0 为第一名，可为小数以实现平滑换位），两者为 dtype（默认 float32）。
+    """
+    source = df_pivot if isinstance(df_pivot, SparseFrame) else _DenseSource(df_pivot)
+    times = period_times(source.index)
+    frame_times, start, stop, frac = _frame_schedule(times, steps_per_unit, easing, per_period)
+
+    # 每个区段的候选实体（起点或终点时期的前 n + margin 名），按最大数量补齐为矩形，
+    # 同时记下它们在起点和终点时期的数值与名次
+    keep = min(n + margin, source.n_entities)
+    n_segments = max(len(times) - 1, 1)
+    candidates = [np.union1d(source.top(k, keep), source.top(min(k + 1, len(times) - 1), keep))
+                  for k in range(n_segments)]
+    width = max(len(c) for c in candidates)
+    table = np.full((n_segments, width), -1, dtype=np.int32)
+    start_values, stop_values, start_ranks, stop_ranks = (np.zeros((n_segments, width), dtype=dtype)
+                                                          for _ in range(4))
+    for k, c in enumerate(candidates):
+        table[k, :len(c)] = c
+        start_values[k, :len(c)], start_ranks[k, :len(c)] = source.lookup(k, c)
+        stop_values[k, :len(c)], stop_ranks[k, :len(c)] = source.lookup(min(k + 1, len(times) - 1), c)
+
+    # 单个时期时起止相同，其余情况下 start 即为区段号
+    entities = table[start]
+    valid = entities >= 0
+    frac = frac.astype(dtype)[:, None]
+    frame_values = start_values[start] + (stop_values[start] - start_values[start]) * frac
+    frame_positions = start_ranks[start] + (stop_ranks[start] - start_ranks[start]) * frac
+    frame_values[~valid] = 0
+    frame_positions[~valid] = np.inf
+    return frame_times, entities, frame_values, frame_positions
+
+
+class PeriodLabel:
+    """按透视表索引生成时间标签：显示每帧所处时期的起点
+
+    整数索引显示为“2020年”，其他数值原样显示；日期按精度显示为年、季度、年月或年月日（见 data.period_labels）。
+    """
+
+    def __init__(self, index):
+        self.times = period_times(index)
+        self.labels = period_labels(index)
+        # 容许插值带来的微小误差，正好落在时期上的帧显示该时期
+        span = self.times[-1] - self.times[0] if len(self.times) > 1 else 1.0
+        self.tolerance = abs(span) * 1e-9
+
+    def __call__(self, t):
+        i = np.searchsorted(self.times, t + self.tolerance, side='right') - 1
+        return self.labels[max(int(i), 0)]
+
+
+class BarRace:
+    """复用同一张图和同一组条形对象的条形图赛跑动画；df_pivot 为透视表或 SparseFrame
+
+    interpolated 为已用相同参数算好的 interpolate_top_n 结果，省略时在构造时计算（并行渲染的子进程中总是重新计算）。
+    """
+
+    def __init__(self, df_pivot, title, n_bars=10, steps_per_unit=1, figsize=(15, 8), dpi=100,
+                 xlabel='数值', time_label=None, easing='linear', per_period=False, interpolated=None):
+        # 保存构造参数，供并行渲染时在子进程中重建相同的图表
+        self.init_args = (df_pivot, title)
+        self.init_kwargs = dict(n_bars=n_bars, steps_per_unit=steps_per_unit, figsize=figsize, dpi=dpi,
+                                xlabel=xlabel, time_label=time_label, easing=easing, per_period=per_period)
+        self.entities = [str(c) for c in df_pivot.columns]
+        self.n_bars = min(n_bars, len(self.entities))
+        # 省略 time_label 时按索引类型生成（年份、月份、任意数值）
+        self.time_label = time_label or PeriodLabel(df_pivot.index)
+        # 每帧只保留可能进入前 n_bars 名的实体，条形对象按槽位复用
+        if interpolated is None:
+            interpolated = interpolate_top_n(df_pivot, self.n_bars, steps_per_unit, easing, per_period)
+        self.times, self.visible, self.values, self.positions = interpolated
+
+        # 每帧所在的区段（相邻两个时期之间），用于帧缓存
+        times = period_times(df_pivot.index)
+        self.segments = np.clip(np.searchsorted(times, self.times, side='right') - 1, 0, max(len(times) - 2, 0))
+
+        cmap = colormaps['tab20']
+        self.color_codes = np.array([color_index(name) for name in self.entities], dtype=np.int8)
+        self.colors = [cmap(int(k)) for k in self.color_codes]
+
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.figure.subplots_adjust(left=0.15, right=0.95)
+        self._setup_axes(title, xlabel)
+
+    def __len__(self):
+        return len(self.times)
+
+    def _setup_axes(self, title, xlabel):
+        ax = self.ax
+        max_value = float(self.values.max()) if self.values.size else 1.0
+        ax.set_xlim(0, nice_ceiling(max_value * 1.15))
+        ax.set_ylim(-0.6, self.n_bars - 0.4)
+        ax.set_yticks([])
+        ax.set_title(title, fontsize=18)
+        ax.set_xlabel(xlabel)
+        ax.grid(axis='x', linestyle='--', alpha=0.3)
+        ax.xaxis.set_major_formatter(lambda x, _: f'{x:,.0f}')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+
+        # 条形和文字对象只创建一次，逐帧更新
+        n_artists = self.visible.shape[1]
+        self.bars = ax.barh(np.zeros(n_artists), np.zeros(n_artists), height=0.8, animated=True).patches
+        self.names = [ax.text(0, 0, '', ha='right', va='center', fontsize=12, animated=True)
+                      for _ in range(n_artists)]
+        self.labels = [ax.text(0, 0, '', ha='left', va='center', fontsize=11, animated=True)
+                       for _ in range(n_artists)]
+        self.time_text = ax.text(0.98, 0.08, '', transform=ax.transAxes, ha='right', va='bottom',
+                                 fontsize=36, color='#777777', animated=True)
+
+        # 绘制一次静态背景（坐标轴、网格、标题）并缓存
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._name_offset = ax.get_xlim()[1] * 0.005
+
+    def draw_frame(self, i):
+        """在缓存背景上绘制第 i 帧，返回 (高 × 宽 × 4) 的RGBA数组（复用同一缓冲区）"""
+        self.canvas.restore_region(self.background)
+        ax = self.ax
+
+        for slot, entity in enumerate(self.visible[i]):
+            position = self.positions[i, slot]
+            if position > self.n_bars - 0.5:
+                continue
+            value = self.values[i, slot]
+            y = self.n_bars - 1 - position
+
+            bar = self.bars[slot]
+            bar.set_y(y - 0.4)
+            bar.set_width(value)
+            bar.set_color(self.colors[entity])
+            ax.draw_artist(bar)
+
+            name = self.names[slot]
+            name.set_position((-self._name_offset, y))
+            name.set_text(self.entities[entity])
+            ax.draw_artist(name)
+
+            label = self.labels[slot]
+            label.set_position((value + self._name_offset, y))
+            label.set_text(f'{value:,.0f}')
+            ax.draw_artist(label)
+
+        self.time_text.set_text(self.time_label(self.times[i]))
+        ax.draw_artist(self.time_text)
+        return np.asarray(self.canvas.buffer_rgba())
+
+    def _render(self, ranges, workers):
+        if workers > 1:
+            from .parallel import render_frames
+            yield from render_frames(self, ranges, workers)
+            return
+        for start, stop in ranges:
+            for i in range(start, stop):
+                yield self.draw_frame(i)
+
+    def _settings_key(self):
+        # 影响画面但不随帧变化的设置
+        kwargs = self.init_kwargs
+        return repr((matplotlib.__version__, self.init_args[1], kwargs['n_bars'], kwargs['figsize'], kwargs['dpi'],
+                     kwargs['xlabel'], self.ax.get_xlim(), font_state()))
+
+    def segment_spans(self, start=0, stop=None):
+        """把 [start, stop) 按区段切分，返回 [(缓存键, 起始帧, 结束帧), ...]
+
+        缓存键只取决于这些帧实际绘制的内容：可见实体的名称、颜色、数值和位置，以及时间标签。
+        """
+        stop = len(self) if stop is None else stop
+        settings_key = self._settings_key()
+        bounds = np.flatnonzero(np.diff(self.segments[start:stop])) + start + 1
+        edges = [start] + bounds.tolist() + [stop]
+
+        spans = []
+        for a, b in zip(edges[:-1], edges[1:]):
+            if a == b:
+                continue
+            visible = self.visible[a:b]
+            names = '\0'.join(self.entities[e] if e >= 0 else '' for e in visible.ravel())
+            labels = '\0'.join(self.time_label(t) for t in self.times[a:b])
+            colors = np.where(visible >= 0, self.color_codes[visible], -1)
+            key = segment_key(settings_key + names + '\1' + labels, colors,
+                              self.values[a:b], self.positions[a:b])
+            spans.append((key, a, b))
+        return spans
+
+    def frames(self, start=0, stop=None, workers=1, cache=None):
+        """按顺序逐帧生成RGBA数组
+
+        workers > 1 时在进程池中并行渲染（见 parallel 模块），输出与单进程逐字节相同。
+        单进程时返回的数组复用同一缓冲区，需要保留时请自行复制。
+        cache 为 FrameCache 时，输入未变化的区段直接从缓存读出，只重新绘制其余区段。
+        """
+        stop = len(self) if stop is None else stop
+        if cache is None:
+            yield from self._render([(start, stop)], workers)
+            return
+
+        spans = self.segment_spans(start, stop)
+        shape = np.asarray(self.canvas.buffer_rgba()).shape
+        missing = [(a, b) for key, a, b in spans if key not in cache]
+        rendered = self._render(missing, workers)
+        missing = set(missing)
+        for key, a, b in spans:
+            done = 0
+            if (a, b) not in missing:
+                for frame in cache.load(key, shape):
+                    if done < b - a:
+                        yield frame
+                    done += 1
+                if done == b - a:
+                    cache.hits += b - a
+                    continue
+                done = min(done, b - a)
+                # 缓存文件损坏，在当前进程中重新绘制本段（已读出的帧不再产生）
+                segment_frames = (self.draw_frame(i) for i in range(a, b))
+            else:
+                segment_frames = (next(rendered) for _ in range(a, b))
+
+            # 逐帧压缩写入，内存占用与区段长度无关
+            writer = cache.open_segment(key)
+            try:
+                for i, frame in enumerate(segment_frames):
+                    writer.write(frame)
+                    if i >= done:
+                        yield frame
+            except BaseException:
+                writer.abort()
+                raise
+            writer.close()
+            cache.misses += b - a
+
+    @property
+    def frame_size(self):
+        """帧的 (宽, 高) 像素尺寸"""
+        width, height = self.canvas.get_width_height()
+        return int(width), int(height)
+
+    def palette_frames(self, count=5):
+        """均匀抽取若干帧（副本），用于计算GIF的全局调色板"""
+        indices = np.unique(np.linspace(0, len(self) - 1, min(count, len(self))).astype(int))
+        return [self.draw_frame(i).copy() for i in indices]
+
+    def save(self, path, fps, progress_callback=None, workers=1, crf=None, bitrate=None, cache=None, preview=None):
+        """按扩展名保存为 GIF/MP4/WebM；progress_callback(当前帧, 总帧数) 在每帧渲染后调用
+
+        cache 为 FrameCache 时增量渲染，完成后清除本次未用到的缓存区段。
+        preview 为 PreviewWriter 时，每帧同时交给它生成缩略图和预览动画。
+        返回编码器的统计信息（GIF 为大小和画质报告，其他格式为 None）。
+        """
+        total = len(self)
+        palette_frames = self.palette_frames() if path.lower().endswith('.gif') else None
+        if preview is not None:
+            preview.start(total)
+        with open_writer(path, fps, self.frame_size, crf=crf, bitrate=bitrate,
+                         palette_frames=palette_frames) as writer:
+            for i, frame in enumerate(self.frames(workers=workers, cache=cache)):
+                writer.write(frame)
+                if preview is not None:
+                    preview.write(i, frame)
+                if progress_callback is not None:
+                    progress_callback(i, total)
+        if cache is not None:
+            cache.prune()
+        return getattr(writer, 'summary', None)
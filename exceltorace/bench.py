@@ -0,0 +1,163 @@
+"""渲染性能基准测试
+
+用可调规模的合成数据（实体数、时期数、稀疏度、重复率）跑一遍完整流程，
+分别计时 Excel读取、清洗、合并重复行、透视、插值、创建图表、逐帧绘制、编码和静态图表导出，结果写成JSON，
+便于在不同版本之间比较。全部在 Agg 后端上运行，不需要图形界面。
+"""
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+from .barrace import BarRace, interpolate_top_n
+from .data import TopNIndex, aggregate_frame, clean_frame, read_table
+from .encoders import open_writer
+from .render import create_static_charts
+from .snapshots import MemorySink, export_snapshots
+from .sparse import SparseFrame
+
+STAGES = ('excel_read', 'clean', 'aggregate', 'pivot', 'interpolate', 'race_setup', 'rasterize', 'encode',
+          'static_export', 'snapshots')
+
+
+def generate_dataset(entities=50, periods=30, sparsity=0.0, duplicate_rate=0.0, start_year=1990, seed=0):
+    """生成长格式的合成数据（year, country, gdp）
+
+    每个实体的数值为带随机增长率的序列；sparsity 为随机缺失的 (时期, 实体) 比例，
+    duplicate_rate 为额外加入的、与已有行 (年份, 实体) 相同但数值不同的行所占比例。
+    """
+    rng = np.random.default_rng(seed)
+    growth = 1 + rng.normal(0.03, 0.05, size=(periods, entities))
+    values = rng.uniform(100, 10000, size=entities) * np.cumprod(growth, axis=0)
+
+    years = np.repeat(np.arange(start_year, start_year + periods), entities)
+    names = np.tile(np.array([f"实体{i:05d}" for i in range(entities)], dtype=object), periods)
+    df = pd.DataFrame({'year': years, 'country': names, 'gdp': values.ravel().round(2)})
+
+    if sparsity > 0:
+        df = df[rng.random(len(df)) >= sparsity]
+    n_duplicates = int(len(df) * duplicate_rate)
+    if n_duplicates:
+        duplicates = df.sample(n_duplicates, replace=True, random_state=seed).copy()
+        duplicates['gdp'] = (duplicates['gdp'] * rng.uniform(0.9, 1.1, size=n_duplicates)).round(2)
+        df = pd.concat([df, duplicates])
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+class StageTimer:
+    """按阶段累计耗时（秒）"""
+
+    def __init__(self):
+        self.times = dict.fromkeys(STAGES, 0.0)
+
+    def stage(self, name):
+        return _Stage(self.times, name)
+
+
+class _Stage:
+    def __init__(self, times, name):
+        self.times = times
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.times[self.name] += time.perf_counter() - self.start
+
+
+def run_benchmark(entities=50, periods=30, sparsity=0.0, duplicate_rate=0.0, aggregate='sum', steps_per_unit=1,
+                  fmt='gif', fps=10, seed=0, workdir=None):
+    """跑一遍完整的渲染流程，返回包含参数、数据规模和各阶段耗时的字典"""
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        path = os.path.join(tmp, 'bench.xlsx')
+        generate_dataset(entities, periods, sparsity, duplicate_rate, seed=seed).to_excel(path, index=False)
+
+        with timer.stage('excel_read'):
+            raw = read_table(path)
+        with timer.stage('clean'):
+            df = clean_frame(raw)
+        with timer.stage('aggregate'):
+            unique, merged = aggregate_frame(df, aggregate)
+        with timer.stage('pivot'):
+            # 与渲染流程一致，内置引擎使用稀疏表示而不是稠密透视表
+            df_pivot = SparseFrame.from_long(unique)
+        with timer.stage('interpolate'):
+            interpolated = interpolate_top_n(df_pivot, 10, steps_per_unit)
+        with timer.stage('race_setup'):
+            # 使用上面的插值结果，只计时创建图表和背景
+            race = BarRace(df_pivot, "基准测试", steps_per_unit=steps_per_unit, interpolated=interpolated)
+
+        with timer.stage('rasterize'):
+            # 计算GIF全局调色板用的样本帧也是逐帧绘制
+            palette_frames = race.palette_frames() if fmt == 'gif' else None
+        with timer.stage('encode'):
+            writer = open_writer(os.path.join(tmp, f'bench.{fmt}'), fps, race.frame_size,
+                                 palette_frames=palette_frames)
+        try:
+            for i in range(len(race)):
+                with timer.stage('rasterize'):
+                    frame = race.draw_frame(i)
+                with timer.stage('encode'):
+                    writer.write(frame)
+            with timer.stage('encode'):
+                writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        output_size = os.path.getsize(os.path.join(tmp, f'bench.{fmt}'))
+
+        with timer.stage('static_export'):
+            pages = create_static_charts(unique, os.path.join(tmp, 'bench_static.png'), "基准测试")
+        with timer.stage('snapshots'):
+            export_snapshots(TopNIndex(unique, 15), "基准测试", MemorySink(), lambda *args: None)
+
+    return {
+        'params': {'entities': entities, 'periods': periods, 'sparsity': sparsity,
+                   'duplicate_rate': duplicate_rate, 'aggregate': aggregate, 'steps_per_unit': steps_per_unit, 'format': fmt,
+                   'seed': seed},
+        'dataset': {'rows': len(raw), 'clean_rows': len(df), 'merged_rows': merged,
+                    'entities': df_pivot.shape[1], 'periods': df_pivot.shape[0]},
+        'frames': len(race),
+        'output_bytes': output_size,
+        'static_pages': len(pages),
+        'stages': {name: round(seconds, 4) for name, seconds in timer.times.items()},
+        'total': round(sum(timer.times.values()), 4),
+    }
+
+
+def environment():
+    """记录运行环境，便于比较不同机器和版本的结果"""
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_suite(configs, out_path=None, report=print):
+    """依次运行多组参数，返回结果并（可选）写入JSON文件"""
+    results = []
+    for index, config in enumerate(configs, 1):
+        report(f"[{index}/{len(configs)}] {config}")
+        result = run_benchmark(**config)
+        stages = '，'.join(f"{name} {seconds:.2f}s" for name, seconds in result['stages'].items())
+        report(f"[{index}/{len(configs)}] {result['frames']} 帧，共 {result['total']:.2f}s：{stages}")
+        results.append(result)
+
+    suite = {'environment': environment(), 'results': results}
+    if out_path:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(suite, f, ensure_ascii=False, indent=2)
+    return suite
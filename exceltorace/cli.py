@@ -0,0 +1,225 @@
+"""命令行入口：python -m exceltorace render/batch/bench"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from .barrace import EASINGS
+from .data import workbook_cache
+from .encoders import output_format
+from .fonts import setup_fonts
+from .ingest import strip_compression
+from .options import AGGREGATIONS, FORMATS, SHEET_MODES
+from .parallel import default_workers
+from .profiling import Profiler
+from .render import STATIC_PANELS_PER_PAGE, render_file
+from .snapshots import SNAPSHOT_FORMATS
+
+
+def _output_target(input_path, out, fmt):
+    """由 --out 参数得到 (不带扩展名的输出文件名, 格式)；--out 的扩展名优先于 --format"""
+    if not out:
+        return os.path.splitext(strip_compression(input_path))[0], fmt
+    return os.path.splitext(out)[0], output_format(out)
+
+
+def load_manifest(manifest_path):
+    """读取批量任务清单
+
+    支持两种格式：JSON 数组（每项包含 input，可选 out/title/fps/style/format/crf/bitrate/engine/steps/workers/
+    easing/per_period/top/aggregate/sheets/snapshots/static_format/per_page/animated_preview），或纯文本（每行一个数据文件路径，# 开头为注释）。相对路径以清单所在目录为准。
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, encoding='utf-8') as f:
+        content = f.read()
+
+    if manifest_path.endswith('.json'):
+        jobs = json.loads(content)
+    else:
+        jobs = [{'input': line.strip()} for line in content.splitlines()
+                if line.strip() and not line.strip().startswith('#')]
+
+    for job in jobs:
+        if 'input' not in job:
+            raise ValueError(f"清单条目缺少 input 字段: {job}")
+        job['input'] = os.path.join(base_dir, job['input'])
+        if job.get('out'):
+            job['out'] = os.path.join(base_dir, job['out'])
+    return jobs
+
+
+def run_jobs(jobs, defaults, quiet=False):
+    """在同一进程中依次渲染多个任务，返回失败的任务数"""
+    failures = 0
+    for index, job in enumerate(jobs, 1):
+        settings = dict(defaults)
+        settings.update({k: v for k, v in job.items() if v is not None})
+
+        last_percent = [None]
+
+        def report(message, value=None):
+            # 逐帧进度只在整数百分比变化时输出，避免刷屏
+            percent = None if value is None else int(value)
+            if quiet or (percent is not None and percent == last_percent[0]):
+                return
+            last_percent[0] = percent
+            print(f"[{index}/{len(jobs)}] {message}")
+
+        start = time.perf_counter()
+        try:
+            output_filename, fmt = _output_target(settings['input'], settings.get('out'), settings['format'])
+            profiler = Profiler(f"{output_filename}.prof" if settings.get('cprofile') else None)
+            result = render_file(
+                settings['input'],
+                output_filename,
+                settings['title'],
+                int(settings['fps']),
+                settings['style'],
+                report,
+                profiler=profiler,
+                aggregate=settings['aggregate'],
+                sheets=settings['sheets'],
+                fmt=fmt,
+                crf=settings.get('crf'),
+                bitrate=settings.get('bitrate'),
+                engine=settings['engine'],
+                steps_per_unit=int(settings['steps']),
+                easing=settings['easing'],
+                per_period=bool(settings['per_period']),
+                top_n=int(settings['top']),
+                workers=int(settings['workers']) or default_workers(),
+                snapshot_format=settings['snapshots'],
+                frame_cache=settings['frame_cache'],
+                static_format=settings['static_format'],
+                per_page=int(settings['per_page']),
+                animated_preview=bool(settings['animated_preview']),
+            )
+        except Exception as e:
+            failures += 1
+            print(f"[{index}/{len(jobs)}] 失败: {settings['input']}: {str(e)}", file=sys.stderr)
+            continue
+
+        elapsed = time.perf_counter() - start
+        if result['merged_rows'] and quiet:
+            print(f"[{index}/{len(jobs)}] 已合并 {result['merged_rows']} 行重复数据")
+        if result['error']:
+            print(f"[{index}/{len(jobs)}] 警告: 动画生成失败，已改为静态图表: {result['error']}", file=sys.stderr)
+        pages = f"，共 {len(result['pages'])} 页" if len(result['pages']) > 1 else ""
+        print(f"[{index}/{len(jobs)}] 完成: {result['path']}{pages} ({elapsed:.1f}s)")
+        if not quiet:
+            print(profiler.summary())
+        if settings.get('profile_log'):
+            profiler.append_log(settings['profile_log'], input=settings['input'], output=result['path'],
+                                kind=result['kind'])
+    return failures
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='exceltorace', description="将Excel数据渲染为条形图赛跑动画（无需图形界面）")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_render_options(p):
+        p.add_argument('--title', default="全球GDP排名变化", help="图表标题")
+        p.add_argument('--fps', type=int, default=2, help="动画帧率")
+        p.add_argument('--style', choices=['basic', 'pro'], default='basic',
+                       help="basic 与 excel_to_race.py 一致；pro 额外输出每年的PNG并使用专业版静态图表样式")
+        p.add_argument('--format', choices=FORMATS, default='gif',
+                       help="未指定 --out 时的输出格式；MP4/WebM 需要ffmpeg")
+        p.add_argument('--crf', type=int, help="MP4/WebM 的CRF质量参数（越小质量越高）")
+        p.add_argument('--bitrate', help="MP4/WebM 的目标码率，如 2M")
+        p.add_argument('--engine', choices=['native', 'pynimate'], default='native',
+                       help="动画引擎：native 为内置的 blitting 引擎，pynimate 为旧版实现")
+        p.add_argument('--steps', type=int, default=1, help="内置引擎每个时间单位（如一年）的帧数")
+        p.add_argument('--easing', choices=list(EASINGS), default='linear', help="内置引擎相邻时期之间的缓动方式")
+        p.add_argument('--per-period', action='store_true',
+                       help="--steps 按每个时期（相邻两行数据之间）计算，而不是按每个时间单位")
+        p.add_argument('--top', type=int, default=10,
+                       help="内置引擎每帧显示的条形数；只为可能进入前N名的实体插值和绘制，实体再多速度也不变")
+        p.add_argument('--aggregate', choices=list(AGGREGATIONS), default='sum',
+                       help="重复的 (年份, 类别) 行的合并方式：sum 求和，mean 平均，max 最大值，last 保留最后一行")
+        p.add_argument('--sheets', choices=list(SHEET_MODES), default='auto',
+                       help="Excel工作簿有多个工作表时：first 只读第一个，concat 合并全部，"
+                            "periods 每个工作表为一个时期（工作表名为年份），auto 按表头和工作表名自动判断")
+        p.add_argument('--workers', type=int, default=1,
+                       help="内置引擎并行渲染帧的进程数，0 表示使用全部CPU核")
+        p.add_argument('--snapshots', choices=SNAPSHOT_FORMATS, default='png',
+                       help="pro 样式每年快照的输出方式：png 为逐年PNG文件，zip 为单个ZIP包，sprite 为拼图及其 .json 索引")
+        p.add_argument('--static-format', choices=['png', 'pdf'], default='png',
+                       help="动画失败时静态图表的格式：png 超过一页时输出带页码的PNG序列，pdf 输出多页PDF")
+        p.add_argument('--per-page', type=int, default=STATIC_PANELS_PER_PAGE, help="静态图表每页的年份数")
+        p.add_argument('--animated-preview', action='store_true',
+                       help="另外输出低分辨率的预览动画 <输出文件名>_preview.gif")
+        p.add_argument('--no-disk-cache', action='store_true',
+                       help="不在数据文件旁读写 .racecache 列式缓存")
+        p.add_argument('--frame-cache', action='store_true',
+                       help="使用输出文件旁的 .framecache 帧缓存，再次渲染时只重新绘制有变化的区段（每帧约占数十KB磁盘）")
+        p.add_argument('--profile-log', help="把每个任务各阶段的耗时和内存追加到该 JSON Lines 文件")
+        p.add_argument('--cprofile', action='store_true', help="用 cProfile 分析渲染过程，统计保存为 <输出文件名>.prof")
+        p.add_argument('-q', '--quiet', action='store_true', help="只输出结果，不输出进度")
+
+    render_parser = subparsers.add_parser('render', help="渲染一个或多个数据文件")
+    render_parser.add_argument('inputs', nargs='+', help="Excel数据文件")
+    render_parser.add_argument('--out', help="输出文件，如 race.gif 或 race.mp4（仅在单个输入时可用）")
+    add_render_options(render_parser)
+
+    batch_parser = subparsers.add_parser('batch', help="按清单批量渲染")
+    batch_parser.add_argument('manifest', help="任务清单（.json 或每行一个路径的文本文件）")
+    add_render_options(batch_parser)
+
+    bench_parser = subparsers.add_parser('bench', help="用合成数据测试各阶段的渲染性能")
+    bench_parser.add_argument('--entities', type=int, nargs='+', default=[50], help="实体数（可给多个）")
+    bench_parser.add_argument('--periods', type=int, nargs='+', default=[30], help="时期数（可给多个）")
+    bench_parser.add_argument('--sparsity', type=float, default=0.0, help="随机缺失的 (时期, 实体) 比例")
+    bench_parser.add_argument('--duplicates', type=float, default=0.0, help="重复的 (年份, 实体) 行所占比例")
+    bench_parser.add_argument('--aggregate', choices=list(AGGREGATIONS), default='sum', help="重复行的合并方式")
+    bench_parser.add_argument('--steps', type=int, default=1, help="每个时间单位的帧数")
+    bench_parser.add_argument('--format', choices=FORMATS, default='gif', help="动画输出格式")
+    bench_parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    bench_parser.add_argument('--json', help="把结果写入该JSON文件")
+
+    return parser
+
+
+def run_bench(args):
+    """按实体数 × 时期数的组合运行基准测试"""
+    from .bench import run_suite
+
+    configs = [{'entities': entities, 'periods': periods, 'sparsity': args.sparsity,
+                'duplicate_rate': args.duplicates, 'aggregate': args.aggregate, 'steps_per_unit': args.steps, 'fmt': args.format,
+                'seed': args.seed}
+               for entities in args.entities for periods in args.periods]
+    run_suite(configs, args.json)
+    if args.json:
+        print(f"结果已保存为 {args.json}")
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'bench':
+        setup_fonts()
+        return run_bench(args)
+
+    defaults = {'title': args.title, 'fps': args.fps, 'style': args.style, 'out': None,
+                'format': args.format, 'crf': args.crf, 'bitrate': args.bitrate,
+                'engine': args.engine, 'steps': args.steps, 'workers': args.workers,
+                'easing': args.easing, 'per_period': args.per_period, 'top': args.top,
+                'aggregate': args.aggregate, 'sheets': args.sheets, 'snapshots': args.snapshots, 'static_format': args.static_format, 'per_page': args.per_page,
+                'animated_preview': args.animated_preview,
+                'frame_cache': args.frame_cache, 'profile_log': args.profile_log, 'cprofile': args.cprofile}
+    if args.command == 'render':
+        if args.out and len(args.inputs) > 1:
+            parser.error("--out 只能用于单个输入文件")
+        jobs = [{'input': path, 'out': args.out} for path in args.inputs]
+    else:
+        jobs = load_manifest(args.manifest)
+
+    if args.no_disk_cache:
+        workbook_cache.persist = False
+
+    # 整批任务只初始化一次字体
+    setup_fonts()
+    failures = run_jobs(jobs, defaults, args.quiet)
+    return 1 if failures else 0
@@ -0,0 +1,554 @@
+"""数据读取与清洗"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from . import ingest, store
+from .options import AGGREGATIONS
+from .profiling import stage
+from .sparse import SparseFrame
+
+
+def _noop_report(message, value=None):
+    pass
+
+
+# 快速验证时抽样读取的行数
+VALIDATION_SAMPLE_ROWS = 1000
+
+NO_VALID_ROWS = "数据文件中没有有效数据：需要第一列为年份、第三列为数值的数字行"
+
+
+def read_table(path, nrows=None, sheets='auto'):
+    """读取原始表格数据（Excel或CSV/TSV，见 ingest 模块）；指定 nrows 时只读取表头和前 nrows 行"""
+    columns, chunks = ingest.read_chunks(path, nrows, sheets)
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def parse_times(raw):
+    """把原始的时间列转换为数字或日期，无法识别的值为 NaN/NaT
+
+    数字（年份、带小数的时间）原样使用；Excel 日期列保留为日期；文字按日期解析，
+    可识别“2020-03”“2020/3/15”以及“2020Q1”这样的季度。两种方式都能识别时取能识别更多值的一种。
+    """
+    if pd.api.types.is_datetime64_any_dtype(raw.dtype):
+        return raw.astype('datetime64[ns]')
+    numeric = pd.to_numeric(raw, errors='coerce')
+    if pd.api.types.is_numeric_dtype(raw.dtype) or not (raw.notna() & numeric.isna()).any():
+        return numeric
+    dates = pd.to_datetime(raw.astype(object).where(numeric.isna()), errors='coerce', format='mixed')
+    if dates.notna().sum() > numeric.notna().sum():
+        return dates.astype('datetime64[ns]')
+    return numeric
+
+
+def period_labels(periods):
+    """时期的显示文字
+
+    整数显示为“2020年”，其他数值原样显示；日期按精度显示为年、季度（只有1、4、7、10月的月初）、年月或年月日。
+    """
+    index = pd.Index(periods)
+    if isinstance(index, pd.PeriodIndex):
+        index = index.to_timestamp()
+    if isinstance(index, pd.DatetimeIndex):
+        if not (index.day == 1).all():
+            return [f"{d.year}年{d.month}月{d.day}日" for d in index]
+        if (index.month == 1).all():
+            return [f"{d.year}年" for d in index]
+        if index.month.isin([1, 4, 7, 10]).all():
+            return [f"{d.year}年第{(d.month + 2) // 3}季度" for d in index]
+        return [f"{d.year}年{d.month}月" for d in index]
+    times = np.asarray(index, dtype=float)
+    if np.all(times == np.round(times)):
+        return [f"{int(t)}年" for t in times]
+    return [f"{t:.15g}" for t in times]
+
+
+def period_key(period):
+    """时期用于文件名等处的文字：数值如 2020、2020.5，日期如 2020-04-01"""
+    if isinstance(period, (np.datetime64, pd.Timestamp)):
+        return str(pd.Timestamp(period).date())
+    return f"{period:.15g}"
+
+
+class FrameInspector:
+    """逐块累计原始数据中的类型问题，流式读取时与 inspect_frame 给出相同的问题描述"""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.bad = {0: 0, 2: 0}
+        self.examples = {0: [], 2: []}
+        self.missing = {0: 0, 1: 0, 2: 0}
+
+    def add(self, df):
+        """检查一块原始数据，返回转换后的 (时间, 数值)，时间为数字或日期（见 parse_times）"""
+        numeric = []
+        for position in (0, 2):
+            raw = df.iloc[:, position]
+            values = parse_times(raw) if position == 0 else pd.to_numeric(raw, errors='coerce')
+            bad = raw.notna() & values.isna()
+            if bad.any():
+                self.bad[position] += int(bad.sum())
+                examples = self.examples[position]
+                examples.extend(v for v in raw[bad].unique()[:3] if v not in examples)
+                del examples[3:]
+            self.missing[position] += int(raw.isna().sum())
+            numeric.append(values)
+        self.missing[1] += int(df.iloc[:, 1].isna().sum())
+        return numeric[0], numeric[1]
+
+    def problems(self, duplicates=(0, None)):
+        """问题描述列表；duplicates 为重复的 (年份, 类别) 行数和第一个重复的组合（见 duplicate_rows）"""
+        problems = []
+        for position, label in ((0, "年份"), (1, "类别"), (2, "数值")):
+            if self.bad.get(position):
+                examples = ', '.join(str(v) for v in self.examples[position])
+                problems.append(f"列 {self.columns[position]}（{label}）有 {self.bad[position]} 个非数字值，"
+                                f"例如: {examples}")
+            if self.missing[position]:
+                problems.append(f"列 {self.columns[position]}（{label}）有 {self.missing[position]} 个空值，"
+                                f"这些行会被忽略")
+
+        count, example = duplicates
+        if count:
+            year, country = example
+            problems.append(f"有 {count} 行重复的 (年份, 类别) 组合，渲染时将按所选方式合并，"
+                            f"例如: {period_key(year)} / {country}")
+        return problems
+
+
+def inspect_frame(df):
+    """检查原始数据前三列的类型问题，返回问题描述列表
+
+    包括非数字的年份、非数字的数值，以及渲染前需要合并的重复 (年份, 类别) 组合。
+    """
+    if len(df.columns) < 3:
+        return []
+    inspector = FrameInspector(df.columns)
+    year, _ = inspector.add(df)
+    keys = pd.DataFrame({'year': year, 'country': df.iloc[:, 1]}).dropna()
+    duplicated = keys.duplicated()
+    if not duplicated.any():
+        return inspector.problems()
+    first = keys[duplicated].iloc[0]
+    return inspector.problems((int(duplicated.sum()), (first['year'], first['country'])))
+
+
+def _group_keys(df):
+    """把 (年份, 类别) 编码为一个 int64 键，返回 (键, 年份编码对应的年份, 类别列, 类别非空的行)
+
+    类别为空的行编码为 -1，会与上一年份最后一个类别的键相同，调用方需用最后一项排除这些行。
+    """
+    country = df['country']
+    if not isinstance(country.dtype, pd.CategoricalDtype):
+        country = country.astype('category')
+    year_codes, years = pd.factorize(df['year'], sort=True)
+    n_categories = max(len(country.cat.categories), 1)
+    codes = country.cat.codes.to_numpy()
+    keys = year_codes.astype(np.int64) * n_categories + codes
+    return keys, years, country, codes >= 0
+
+
+def duplicate_rows(df):
+    """清洗后数据中重复的 (年份, 类别) 行数和第一个重复的组合，没有重复时为 (0, None)；类别为空的行不计"""
+    keys, _, _, valid = _group_keys(df)
+    duplicated = pd.Series(keys[valid], copy=False).duplicated().to_numpy()
+    if not duplicated.any():
+        return 0, None
+    first = np.flatnonzero(valid)[duplicated.argmax()]
+    return int(duplicated.sum()), (df['year'].iloc[first], df['country'].iloc[first])
+
+
+def validate_columns(columns, problems=(), note=""):
+    """检查表头，返回 (是否有效, 提示信息)"""
+    if len(columns) < 3:
+        return False, "错误: 数据文件应至少包含3列 (年份、国家/类别、数值)"
+    message = f"文件有效。列名: {', '.join(str(c) for c in columns[:3])}"
+    if problems:
+        message += f"\n发现以下问题{note}:\n" + "\n".join(f"- {p}" for p in problems)
+    return True, message
+
+
+def validate_frame(df, note=""):
+    """检查表格结构和类型，返回 (是否有效, 提示信息)；没有任何有效行时无效"""
+    problems = inspect_frame(df)
+    if len(df.columns) >= 3 and not len(clean_frame(df)):
+        return False, "\n".join([f"错误: {NO_VALID_ROWS}{note}"] + [f"- {p}" for p in problems])
+    return validate_columns(list(df.columns), problems, note)
+
+
+def validate_file(path, cache=None, sample_rows=VALIDATION_SAMPLE_ROWS, sheets='auto'):
+    """验证数据文件格式是否正确，返回 (是否有效, 提示信息)
+
+    已缓存的文件使用完整数据的检查结果；否则只读取表头和前 sample_rows 行，
+    即使是数百万行的表格也能立即给出反馈。
+    """
+    if cache is None:
+        cache = workbook_cache
+    try:
+        entry = cache.peek(path, sheets)
+        if entry is not None and entry.error is not None:
+            return False, "\n".join([f"错误: {entry.error}"] + [f"- {p}" for p in entry.problems])
+        if entry is not None:
+            return validate_columns(entry.columns, entry.problems)
+        return validate_frame(read_table(path, nrows=sample_rows, sheets=sheets), f"（基于前 {sample_rows} 行抽样）")
+    except Exception as e:
+        return False, f"验证数据文件时出错: {str(e)}"
+
+
+def _small_int(values):
+    """整数数组转换为能容纳其取值范围的最小类型：int16（年份通常如此）或 int32，都放不下时保持 int64"""
+    if not len(values):
+        return values.astype(np.int16)
+    low, high = values.min(), values.max()
+    for dtype in (np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def _compact_times(times):
+    """整数时间（年份）转换为最小的整数类型；带小数的数值和日期保持原样"""
+    if times.dtype.kind == 'f' and np.all(times == np.round(times)):
+        return _small_int(times.astype(np.int64))
+    if times.dtype.kind in 'iu':
+        return _small_int(times.astype(np.int64))
+    return times
+
+
+def clean_chunk(df, year, value):
+    """由一块原始数据及其转换后的时间、数值列，得到 year/country/gdp 长格式数据
+
+    丢弃时间或数值无效、类别为空的行；整数时间（年份）使用能容纳其范围的最小整数类型，
+    带小数的时间和日期保持原样，类别为 category，数值为 float32。
+    """
+    keep = (year.notna() & value.notna() & df.iloc[:, 1].notna()).to_numpy()
+    country = df.iloc[:, 1][keep]
+    if not isinstance(country.dtype, pd.CategoricalDtype):
+        country = country.astype('category')
+    return pd.DataFrame({
+        'year': _compact_times(year.to_numpy()[keep]),
+        'country': country.array,
+        'gdp': value.to_numpy()[keep].astype(np.float32),
+    })
+
+
+def clean_frame(df):
+    """将前三列整理为 year/country/gdp 并转换为紧凑的类型（见 clean_chunk）"""
+    if len(df.columns) < 3:
+        raise ValueError("数据文件格式不正确，需要至少3列数据")
+    year = parse_times(df.iloc[:, 0])
+    value = pd.to_numeric(df.iloc[:, 2], errors='coerce')
+    return clean_chunk(df, year, value)
+
+
+def concat_chunks(chunks):
+    """合并 clean_chunk 得到的数据块，各块的类别合并为一个 category"""
+    if len(chunks) == 1:
+        return chunks[0]
+    countries = [chunk['country'].array for chunk in chunks]
+    try:
+        country = union_categoricals(countries, sort_categories=True)
+    except TypeError:
+        # 各块的类别类型不同（如一个工作表为数字、另一个为文字）时统一为文字
+        country = union_categoricals([c.rename_categories(c.categories.astype(str)) for c in countries],
+                                     sort_categories=True)
+    kinds = {chunk['year'].dtype.kind == 'M' for chunk in chunks}
+    if len(kinds) > 1:
+        raise ValueError("时间列中日期和数字混用，无法合并")
+    return pd.DataFrame({
+        'year': np.concatenate([chunk['year'].to_numpy() for chunk in chunks]),
+        'country': country,
+        'gdp': np.concatenate([chunk['gdp'].to_numpy() for chunk in chunks]),
+    })
+
+
+def aggregate_frame(df, how='sum'):
+    """按 (年份, 类别) 合并重复的行，返回 (合并后的数据, 被合并掉的行数)
+
+    年份和类别先编码为整数并合成一个键，再做一次分组聚合，千万行级别的明细数据也不需要逐行处理。
+    没有重复时原样返回 df。类别为空的行被丢弃。how 为 AGGREGATIONS 中的合并方式。
+    """
+    if how not in AGGREGATIONS:
+        raise ValueError(f"不支持的合并方式: {how}（可选: {', '.join(AGGREGATIONS)}）")
+    keys, years, country, valid = _group_keys(df)
+    n_categories = max(len(country.cat.categories), 1)
+    values = df['gdp'].to_numpy()
+    if not valid.all():
+        # 类别为空的行不属于任何实体，不参与合并
+        keys, values = keys[valid], values[valid]
+
+    merged = len(keys) - len(pd.unique(keys))
+    if not merged:
+        return (df, 0) if valid.all() else (df[valid].reset_index(drop=True), 0)
+    values = pd.Series(values, copy=False).groupby(keys, sort=True).agg(how)
+    keys = values.index.to_numpy()
+    frame = pd.DataFrame({
+        'year': years.to_numpy()[keys // n_categories],
+        'country': pd.Categorical.from_codes(keys % n_categories, dtype=country.dtype),
+        'gdp': values.to_numpy(),
+    })
+    return frame, merged
+
+
+def pivot_frame(df):
+    """将长格式数据透视为 year × country 的宽表，缺失值补0"""
+    return df.pivot(index='year', columns='country', values='gdp').fillna(0)
+
+
+class TopNIndex:
+    """每个时期数值最大的前 n 个实体
+
+    只对整张表做一次排序：按 (year 升序, gdp 降序) 排列后，用组内序号保留每年前 n 行，
+    再记录每年在结果中的起止位置，按年份取数据为 O(1) 的切片。labels 为各时期的显示文字（见 period_labels）。
+    """
+
+    def __init__(self, df, n):
+        ordered = df.sort_values(['year', 'gdp'], ascending=[True, False], kind='stable')
+        top = ordered[ordered.groupby('year', sort=False).cumcount().to_numpy() < n]
+        self.frame = top.reset_index(drop=True)
+        self.n = n
+
+        year_values = self.frame['year'].to_numpy()
+        self.years = pd.unique(year_values)
+        self._starts = np.searchsorted(year_values, self.years, side='left')
+        self._stops = np.searchsorted(year_values, self.years, side='right')
+        self._positions = pd.Index(self.years)
+        self.labels = period_labels(self.years)
+
+    def __len__(self):
+        return len(self.years)
+
+    def __getitem__(self, year):
+        """某一年的前 n 行（按数值降序）"""
+        i = self._positions.get_loc(year)
+        return self.frame.iloc[self._starts[i]:self._stops[i]]
+
+    def __iter__(self):
+        """按年份升序依次生成 (year, 当年前 n 行)"""
+        for i, year in enumerate(self.years):
+            yield year, self.frame.iloc[self._starts[i]:self._stops[i]]
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """计算文件内容的哈希值"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def workbook_key(path):
+    """缓存键：绝对路径、修改时间、文件大小和内容哈希"""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, file_digest(path))
+
+
+class WorkbookEntry:
+    """一个已解析的工作簿：原始列名和清洗后的长格式数据（year/country/gdp）
+
+    nbytes 包括首次使用时才计算并缓存的透视表、稀疏表示和合并结果，
+    每缓存一项就通知所在的 WorkbookCache 重新检查内存上限。
+    """
+
+    def __init__(self, path, digest, columns, frame, error=None, problems=(), persist=False):
+        self.path = path
+        self.digest = digest
+        self.columns = columns
+        self.frame = frame
+        self.error = error
+        self.problems = list(problems)
+        self.persist = persist
+        self._pivot = None
+        self._sparse = None
+        self._aggregated = {}
+        self.cache = None
+        self.nbytes = 0 if frame is None else int(frame.memory_usage(deep=True).sum())
+
+    def _grew(self, nbytes):
+        """记录新缓存的派生数据占用的内存，超出上限时由所在的缓存淘汰最久未用的条目"""
+        self.nbytes += int(nbytes)
+        if self.cache is not None:
+            self.cache.evict()
+
+    def pivot(self):
+        """宽格式透视表（year × country，缺失值补0），首次计算后缓存"""
+        if self._pivot is None:
+            if self.persist:
+                self._pivot = store.load_pivot(self.path, self.digest)
+            if self._pivot is None:
+                self._pivot = pivot_frame(self.frame)
+                if self.persist:
+                    try:
+                        store.save_pivot(self.path, self.digest, self._pivot)
+                    except OSError:
+                        pass
+            self._grew(self._pivot.memory_usage(deep=True).sum())
+        return self._pivot
+
+    def aggregated(self, how='sum'):
+        """合并重复的 (年份, 类别) 行后的数据和被合并掉的行数（见 aggregate_frame），按合并方式缓存"""
+        if how not in self._aggregated:
+            frame, merged = self._aggregated[how] = aggregate_frame(self.frame, how)
+            # 没有需要合并的行时返回的就是 self.frame，不额外占用内存
+            if frame is not self.frame:
+                self._grew(frame.memory_usage(deep=True).sum())
+        return self._aggregated[how]
+
+    def sparse(self):
+        """按时期排序的稀疏表示（SparseFrame），内存只与非空单元格数有关，首次计算后缓存"""
+        if self._sparse is None:
+            self._sparse = SparseFrame.from_long(self.frame)
+            self._grew(self._sparse.nbytes)
+        return self._sparse
+
+
+class WorkbookCache:
+    """按 LRU 淘汰、受内存上限约束的已解析工作簿缓存
+
+    缓存中的 DataFrame 在多次渲染间共享，调用方不应原地修改。
+    persist 为 True 时还会把清洗结果以列式格式保存在数据文件旁（见 store 模块），
+    之后的进程可直接以内存映射方式加载。
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, persist=True):
+        self.max_bytes = max_bytes
+        self.persist = persist
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def peek(self, path, sheets='auto'):
+        """不解析数据文件，只从内存或磁盘缓存中查找；按路径、修改时间、大小和工作表处理方式匹配"""
+        stat = os.stat(path)
+        prefix = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            for key, entry in self._entries.items():
+                if key[:3] == prefix and key[4] == sheets:
+                    self._entries.move_to_end(key)
+                    return entry
+
+        if not self.persist:
+            return None
+        stored = store.load_frame(path, stat, sheets)
+        if stored is None:
+            return None
+        digest, columns, frame, problems = stored
+        entry = WorkbookEntry(path, digest, columns, frame, problems=problems, persist=True)
+        self._store(prefix + (digest, sheets), entry)
+        return entry
+
+    def get(self, path, report=_noop_report, sheets='auto'):
+        """返回数据文件对应的 WorkbookEntry，未命中时读取并清洗文件
+
+        数据按块读取（见 ingest 模块），每块读入后立即检查类型问题并转换为紧凑的列类型
+        （见 clean_chunk），内存中不会同时保留整个文件的原始数据。
+        """
+        with stage('read'):
+            entry = self.peek(path, sheets)
+            if entry is not None:
+                return entry
+
+            stat = os.stat(path)
+            key = workbook_key(path) + (sheets,)
+            report("正在读取数据...", 10)
+            columns, chunks = ingest.read_chunks(path, sheets=sheets)
+            inspector = FrameInspector(columns)
+            cleaned = []
+            error = None
+            rows = 0
+            for chunk in chunks:
+                if len(chunk.columns) < 3:
+                    error = "数据文件格式不正确，需要至少3列数据"
+                    break
+                year, value = inspector.add(chunk)
+                cleaned.append(clean_chunk(chunk, year, value))
+                rows += len(chunk)
+                report(f"正在读取数据...（已读取 {rows} 行）")
+            if not cleaned and error is None:
+                error = NO_VALID_ROWS
+
+        report("正在处理数据...", 30)
+        if error is None:
+            with stage('clean'):
+                # 各块的类别合并为一个 category，节省内存并便于列式保存
+                frame = concat_chunks(cleaned)
+                del cleaned
+            if not len(frame):
+                error = NO_VALID_ROWS
+        if error is not None:
+            # 没有有效数据时保留类型问题，说明哪些行被忽略了
+            problems = inspector.problems() if len(columns) >= 3 else []
+            entry = WorkbookEntry(path, key[3], columns, None, error, problems)
+        else:
+            with stage('validate'):
+                problems = inspector.problems(duplicate_rows(frame))
+            entry = WorkbookEntry(path, key[3], columns, frame, problems=problems, persist=self.persist)
+            if self.persist:
+                try:
+                    store.save_frame(path, stat, key[3], columns, frame, problems, sheets)
+                except OSError:
+                    # 数据目录不可写时只使用内存缓存
+                    entry.persist = False
+        self._store(key, entry)
+        return entry
+
+    def _store(self, key, entry):
+        if entry.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            # 同一路径的旧版本已失效，直接移除
+            for old_key in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[old_key]
+            self._entries[key] = entry
+            entry.cache = self
+        self.evict()
+
+    def evict(self):
+        """淘汰最久未用的条目，直到总内存不超过上限（至少保留最近使用的一个）"""
+        with self._lock:
+            total = sum(e.nbytes for e in self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                total -= evicted.nbytes
+
+
+# 进程内共享的默认缓存
+workbook_cache = WorkbookCache()
+
+
+def load_data(path, report=_noop_report, cache=None, sheets='auto'):
+    """读取并清洗数据文件，返回长格式 DataFrame（优先使用缓存）；sheets 为 SHEET_MODES 中的工作表处理方式"""
+    return load_entry(path, report, cache, sheets).frame
+
+
+def load_entry(path, report=_noop_report, cache=None, sheets='auto'):
+    """与 load_data 相同，但返回 WorkbookEntry（可取得缓存的透视表）"""
+    if cache is None:
+        cache = workbook_cache
+    entry = cache.get(path, report, sheets)
+    if entry.frame is None:
+        raise ValueError(entry.error)
+    return entry
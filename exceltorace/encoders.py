@@ -0,0 +1,221 @@
+"""动画输出编码器
+
+GIF 由内置的增量编码器写出（全局调色板、差异区域裁剪、相同帧合并）；
+MP4/WebM 通过管道把原始 RGBA 帧逐帧写入 ffmpeg 子进程。两者都不在内存中保留帧列表，
+内存占用与动画长度无关。ffmpeg 路径沿用 matplotlib 的 rcParams['animation.ffmpeg_path']。
+"""
+import os
+import shutil
+import struct
+import subprocess
+import time
+
+import matplotlib
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+from .options import FORMATS
+
+# 各格式的默认编码参数
+_CODECS = {
+    'mp4': ['-c:v', 'libx264', '-preset', 'medium', '-pix_fmt', 'yuv420p', '-movflags', '+faststart'],
+    'webm': ['-c:v', 'libvpx-vp9', '-pix_fmt', 'yuv420p', '-row-mt', '1'],
+}
+_DEFAULT_CRF = {'mp4': 23, 'webm': 32}
+
+
+def output_format(path):
+    """由文件扩展名得到输出格式"""
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的输出格式: {fmt or path}（可选: {', '.join(FORMATS)}）")
+    return fmt
+
+
+def ffmpeg_path():
+    """查找ffmpeg可执行文件"""
+    path = shutil.which(matplotlib.rcParams['animation.ffmpeg_path'])
+    if path is None:
+        raise RuntimeError("未找到ffmpeg，无法输出MP4/WebM。请安装ffmpeg或改用GIF格式")
+    return path
+
+
+class FFmpegWriter:
+    """把RGBA帧流式写入ffmpeg进程的视频编码器
+
+    crf 控制质量（数值越小质量越高），bitrate 为目标码率（如 '2M'）；
+    两者都省略时使用各格式的默认CRF。
+    """
+
+    def __init__(self, path, fps, size, crf=None, bitrate=None):
+        self.path = path
+        fmt = output_format(path)
+        width, height = size
+        args = [ffmpeg_path(), '-y', '-loglevel', 'error',
+                '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', str(fps),
+                '-i', '-',
+                # yuv420p 要求宽高为偶数
+                '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+        args += _CODECS[fmt]
+        if bitrate:
+            args += ['-b:v', str(bitrate)]
+        if crf is not None or not bitrate:
+            args += ['-crf', str(_DEFAULT_CRF[fmt] if crf is None else crf)]
+            if fmt == 'webm' and not bitrate:
+                # VP9 的恒定质量模式需要 -b:v 0
+                args += ['-b:v', '0']
+        args.append(path)
+        self._process = subprocess.Popen(args, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frame):
+        self._process.stdin.write(memoryview(frame).cast('B'))
+
+    def close(self):
+        self._process.stdin.close()
+        stderr = self._process.stderr.read()
+        if self._process.wait() != 0:
+            raise RuntimeError(f"ffmpeg编码失败: {stderr.decode(errors='replace').strip()}")
+
+    def abort(self):
+        self._process.kill()
+        self._process.wait()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class GifWriter:
+    """针对条形图赛跑优化的增量GIF编码器
+
+    - 全部帧共用一个全局调色板，只计算一次（来自 palette_frames 或第一帧）；
+    - 每帧只写入与上一帧不同的矩形区域，区域内未变化的像素设为透明，
+      配合“保留上一帧”的处置方式叠加显示；
+    - 与上一帧完全相同的帧（如每年的停顿）合并为一帧并累加显示时长；
+    - 每帧量化后立即编码写入文件，不在内存中保留帧列表。
+    结束后 summary 中为文件大小、帧数和画质（PSNR）统计。
+    """
+
+    # 调色板最后一个索引保留为透明色
+    TRANSPARENT = 255
+
+    def __init__(self, path, fps, size, palette_frames=None):
+        self.path = path
+        self.size = size
+        self.duration = 1000 / fps
+        self.palette_frames = palette_frames
+        self.summary = None
+        self._file = open(path, 'wb')
+        self._palette_image = None
+        self._palette = None
+        self._previous = None
+        self._pending = None
+        self._frames_in = 0
+        self._frames_out = 0
+        self._changed_pixels = 0
+        self._squared_error = 0.0
+        self._start = time.perf_counter()
+
+    def _build_palette(self, frames):
+        sample = np.concatenate([np.asarray(f)[:, :, :3] for f in frames], axis=0)
+        image = Image.fromarray(np.ascontiguousarray(sample), 'RGB')
+        colors = image.quantize(colors=self.TRANSPARENT, method=Image.Quantize.MEDIANCUT,
+                                dither=Image.Dither.NONE).getpalette()[:3 * self.TRANSPARENT]
+
+        # 用于映射的调色板只含可见颜色，保证不会映射到透明色
+        self._palette_image = Image.new('P', (1, 1))
+        self._palette_image.putpalette(colors)
+        self._palette = np.zeros((256, 3), dtype=np.uint8)
+        self._palette[:len(colors) // 3] = np.array(colors, dtype=np.uint8).reshape(-1, 3)
+
+        width, height = self.size
+        # GIF89a 文件头、逻辑屏幕描述符（256色全局调色板）和循环播放扩展
+        self._file.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, 0, 0))
+        self._file.write(self._palette.tobytes())
+        self._file.write(b'!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+
+    def write(self, frame):
+        frame = np.asarray(frame)
+        if self._palette is None:
+            self._build_palette(self.palette_frames or [frame])
+        self._frames_in += 1
+
+        image = Image.frombuffer('RGBA', self.size, frame, 'raw', 'RGBA', 0, 1).convert('RGB')
+        indices = np.asarray(image.quantize(palette=self._palette_image, dither=Image.Dither.NONE))
+        # 画质统计只在稀疏网格上抽样，避免拖慢编码
+        error = self._palette[indices[::4, ::4]].astype(np.int32) - frame[::4, ::4, :3]
+        self._squared_error += float(np.mean(error * error))
+
+        if self._previous is None:
+            box = (0, 0, indices.shape[1], indices.shape[0])
+            crop = indices
+        else:
+            changed = indices != self._previous
+            if not changed.any():
+                # 与上一帧相同，只延长上一帧的显示时间
+                self._pending[2] += self.duration
+                return
+            rows = np.flatnonzero(changed.any(axis=1))
+            cols = np.flatnonzero(changed.any(axis=0))
+            box = (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+            crop = indices[box[1]:box[3], box[0]:box[2]].copy()
+            crop[~changed[box[1]:box[3], box[0]:box[2]]] = self.TRANSPARENT
+            self._changed_pixels += int(changed.sum())
+
+        self._flush()
+        self._pending = [crop, box[:2], self.duration]
+        self._previous = indices
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        crop, offset, duration = self._pending
+        image = Image.fromarray(crop, 'P')
+        image.putpalette(self._palette.tobytes())
+        for chunk in GifImagePlugin.getdata(image, offset=offset, duration=round(duration),
+                                            disposal=1, transparency=self.TRANSPARENT):
+            self._file.write(chunk)
+        self._frames_out += 1
+        self._pending = None
+
+    def close(self):
+        self._flush()
+        self._file.write(b';')
+        self._file.close()
+
+        width, height = self.size
+        mse = self._squared_error / max(self._frames_in, 1)
+        psnr = float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+        changed = self._changed_pixels / max((self._frames_in - 1) * width * height, 1)
+        self.summary = (f"GIF: {os.path.getsize(self.path) / 1024:,.0f} KB，"
+                        f"{self._frames_in} 帧合并为 {self._frames_out} 帧，"
+                        f"平均每帧变化 {changed:.1%} 像素，PSNR {psnr:.1f} dB，"
+                        f"编码 {time.perf_counter() - self._start:.1f}s")
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def open_writer(path, fps, size, crf=None, bitrate=None, palette_frames=None):
+    """按扩展名创建编码器；size 为帧的 (宽, 高)，palette_frames 为计算GIF调色板的样本帧"""
+    if output_format(path) == 'gif':
+        return GifWriter(path, fps, size, palette_frames)
+    return FFmpegWriter(path, fps, size, crf=crf, bitrate=bitrate)
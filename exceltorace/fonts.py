@@ -0,0 +1,188 @@
+"""中文字体的解析与缓存
+
+第一次运行时在系统字体文件中查找能显示中文的字体：逐个读取字体文件的字符表，
+检查是否包含 COVERAGE_SAMPLE 中的全部汉字，在满足条件的字体中优先选择当前平台的首选字体。
+结果（字体文件路径和字体名）保存在 matplotlib 缓存目录下的 exceltorace_fonts.json 中，
+之后的启动只需确认该文件未变化，不再扫描。选中的字体按路径注册到 matplotlib，并放在
+font.sans-serif 的首位，绘图时直接命中，不会再按字体名搜索或逐字回退。
+"""
+import hashlib
+import json
+import os
+import platform
+import warnings
+
+import matplotlib
+from matplotlib import font_manager, ft2font
+
+# 与字体和文字渲染相关、需要同步到子进程的配置
+_RC_KEYS = ('font.family', 'font.sans-serif', 'axes.unicode_minus')
+
+FONT_CACHE_FILE = "exceltorace_fonts.json"
+_CACHE_VERSION = 1
+
+# 各平台的首选中文字体（都能覆盖时按此顺序选择）
+PREFERRED_FONTS = {
+    'Windows': ['SimHei', 'Microsoft YaHei', 'SimSun'],
+    'Darwin': ['PingFang SC', 'Heiti SC', 'STHeiti', 'Arial Unicode MS'],
+    'Linux': ['WenQuanYi Zen Hei', 'WenQuanYi Micro Hei', 'Noto Sans CJK SC', 'Source Han Sans SC',
+              'Droid Sans Fallback'],
+}
+
+# 检查字形覆盖时使用的汉字：图表中的固定文字和常见的国家/地区名
+COVERAGE_SAMPLE = "年亿美元数值排名变化全球国家地区中国日本韩国印度德英法俄巴西"
+
+_REGULAR_STYLES = ('Regular', 'Book', 'Normal', 'Medium')
+
+_registered = None
+_configured = False
+
+
+def font_cache_path():
+    """字体解析结果的缓存文件"""
+    return os.path.join(matplotlib.get_cachedir(), FONT_CACHE_FILE)
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _font_files():
+    return sorted(set(font_manager.findSystemFonts()) | {font.fname for font in font_manager.fontManager.ttflist})
+
+
+def _files_digest(files):
+    return hashlib.sha1("\n".join(files).encode('utf-8')).hexdigest()
+
+
+def covers(font, sample=COVERAGE_SAMPLE):
+    """字体（FT2Font）是否为 sample 中的每个字符都提供了各自的字形
+
+    只映射到同一个占位字形的字体（如 Last Resort）不算覆盖。
+    """
+    charmap = font.get_charmap()
+    chars = set(sample)
+    if not all(ord(char) in charmap for char in chars):
+        return False
+    return len({charmap[ord(char)] for char in chars}) == len(chars)
+
+
+def resolve_font(files=None, preferred=None):
+    """在字体文件中查找能显示中文的字体，返回 (文件路径, 字体名)，找不到时返回 (None, None)"""
+    if files is None:
+        files = _font_files()
+    if preferred is None:
+        preferred = PREFERRED_FONTS.get(platform.system(), PREFERRED_FONTS['Linux'])
+
+    best = ((len(preferred) + 1, 0), None, None)
+    for path in files:
+        try:
+            font = ft2font.FT2Font(path)
+        except (OSError, RuntimeError, ValueError):
+            continue
+        # 首选字体在前，同一字体中常规字重优先于粗体、斜体
+        rank = (preferred.index(font.family_name) if font.family_name in preferred else len(preferred),
+                0 if font.style_name in _REGULAR_STYLES else 1)
+        # 只有可能比当前结果更好的字体才需要检查字符表
+        if rank < best[0] and covers(font):
+            best = (rank, path, font.family_name)
+            if rank == (0, 0):
+                break
+    return best[1], best[2]
+
+
+def load_cached_font(cache_path=None):
+    """读取缓存的解析结果 (文件路径, 字体名)；缓存缺失或已失效时返回 None
+
+    找到字体时只检查该文件的修改时间和大小；没有找到时检查系统字体文件列表是否变化。
+    """
+    try:
+        with open(cache_path or font_cache_path(), encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('version') != _CACHE_VERSION or cached.get('system') != platform.system():
+            return None
+        if cached['path'] is None:
+            return (None, None) if cached.get('files') == _files_digest(_font_files()) else None
+        if _file_stamp(cached['path']) != cached['stamp']:
+            return None
+        return cached['path'], cached['name']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_cached_font(path, name, cache_path=None):
+    """保存解析结果"""
+    cached = {'version': _CACHE_VERSION, 'system': platform.system(), 'path': path, 'name': name}
+    if path is None:
+        cached['files'] = _files_digest(_font_files())
+    else:
+        cached['stamp'] = _file_stamp(path)
+    cache_path = cache_path or font_cache_path()
+    directory = os.path.dirname(cache_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cached, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def register_font(path):
+    """按文件路径注册字体并放在 font.sans-serif 首位，返回字体名"""
+    global _registered
+    font_manager.fontManager.addfont(path)
+    name = font_manager.FontProperties(fname=path).get_name()
+    matplotlib.rcParams['font.family'] = 'sans-serif'
+    matplotlib.rcParams['font.sans-serif'] = [name] + [f for f in matplotlib.rcParams['font.sans-serif'] if f != name]
+    _registered = path
+    return name
+
+
+def setup_fonts(refresh=False, cache_path=None):
+    """设置中文字体，返回所用字体名；refresh 为真时忽略缓存重新扫描"""
+    global _configured
+    matplotlib.rcParams['axes.unicode_minus'] = False
+
+    cached = None if refresh else load_cached_font(cache_path)
+    if cached is None:
+        path, name = resolve_font()
+        try:
+            save_cached_font(path, name, cache_path)
+        except OSError:
+            # 缓存目录不可写时下次重新扫描
+            pass
+    else:
+        path, name = cached
+
+    _configured = True
+    if path is None:
+        # 没有中文字体时只提示一次，不再逐字输出缺字警告
+        warnings.filterwarnings('ignore', message=r'Glyph \d+ .* missing from font')
+        print("警告: 未找到支持中文的字体，可能导致图表中文显示为乱码")
+        return None
+
+    name = register_font(path)
+    print(f"使用字体: {name}")
+    return name
+
+
+def ensure_fonts():
+    """本进程尚未设置字体时设置一次"""
+    if not _configured:
+        setup_fonts()
+
+
+def font_state():
+    """需要同步到子进程的字体配置：相关的 rcParams 和已注册的字体文件"""
+    return {key: matplotlib.rcParams[key] for key in _RC_KEYS}, _registered
+
+
+def apply_font_state(state):
+    """在子进程中恢复 font_state() 的结果"""
+    global _configured
+    rc, path = state
+    if path is not None:
+        font_manager.fontManager.addfont(path)
+    matplotlib.rcParams.update(rc)
+    _configured = True
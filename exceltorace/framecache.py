@@ -0,0 +1,111 @@
+"""已渲染帧的磁盘缓存，用于增量重新渲染
+
+动画按相邻两个时期之间的区间分段，每段的帧逐帧压缩写入一个文件（读写时都只在内存中保留一帧），文件名为该段输入的哈希：
+即这些帧用到的插值数值、排名位置、可见实体和时间，再加上影响画面的渲染设置（标题、图表尺寸、
+条形数、坐标轴范围、字体等）。数据文件追加了新的时期后，只有输入发生变化的区段需要重新绘制，
+其余区段直接从缓存读出。缓存目录为输出文件旁的 .<文件名>.framecache。
+"""
+import hashlib
+import os
+import zlib
+
+import numpy as np
+
+# 读取缓存文件时每次读入的字节数
+_READ_SIZE = 1 << 20
+
+
+def frame_cache_dir(out_path):
+    """输出文件对应的帧缓存目录"""
+    directory, name = os.path.split(os.path.abspath(out_path))
+    return os.path.join(directory, f".{os.path.splitext(name)[0]}.framecache")
+
+
+def segment_key(settings_key, *arrays):
+    """由渲染设置和本段输入数组计算缓存键"""
+    digest = hashlib.sha1(settings_key.encode('utf-8'))
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.shape).encode('ascii'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class FrameCache:
+    """按区段保存原始RGBA帧（zlib压缩）的目录缓存"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._used = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def load(self, key, shape):
+        """逐帧读取一段缓存，依次产生 (高 × 宽 × 4) 数组
+
+        文件缺失或损坏时在出错处停止，调用方按已产生的帧数判断是否完整。
+        """
+        frame_bytes = int(np.prod(shape))
+        decompressor = zlib.decompressobj()
+        buffer = bytearray()
+        try:
+            with open(self._path(key), 'rb') as f:
+                while True:
+                    chunk = f.read(_READ_SIZE)
+                    buffer += decompressor.decompress(chunk) if chunk else decompressor.flush()
+                    while len(buffer) >= frame_bytes:
+                        frame = np.frombuffer(bytes(buffer[:frame_bytes]), dtype=np.uint8).reshape(shape)
+                        del buffer[:frame_bytes]
+                        yield frame
+                    if not chunk:
+                        break
+        except (OSError, zlib.error):
+            return
+        if not buffer and decompressor.eof:
+            self._used.add(key)
+
+    def open_segment(self, key):
+        """开始写入一段帧，返回 SegmentWriter"""
+        return SegmentWriter(self, key)
+
+    def prune(self):
+        """删除本次渲染没有用到的区段，缓存大小只与最近一次的动画相当"""
+        for name in os.listdir(self.directory):
+            if os.path.splitext(name)[0] not in self._used:
+                os.remove(os.path.join(self.directory, name))
+
+    @property
+    def summary(self):
+        total = self.hits + self.misses
+        return f"帧缓存：复用 {self.hits}/{total} 帧，重新绘制 {self.misses} 帧"
+
+
+class SegmentWriter:
+    """逐帧压缩写入一段缓存；close() 后才替换为正式文件，abort() 丢弃未写完的文件"""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.path = cache._path(key)
+        self._file = open(f"{self.path}.tmp", 'wb')
+        self._compressor = zlib.compressobj(1)
+
+    def write(self, frame):
+        self._file.write(self._compressor.compress(np.ascontiguousarray(frame)))
+
+    def close(self):
+        self._file.write(self._compressor.flush())
+        self._file.close()
+        os.replace(f"{self.path}.tmp", self.path)
+        self.cache._used.add(self.key)
+
+    def abort(self):
+        self._file.close()
+        os.remove(f"{self.path}.tmp")
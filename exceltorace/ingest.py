@@ -0,0 +1,126 @@
+"""数据文件的读取：Excel工作簿（可含多个工作表）和 CSV/TSV（可为 gzip 等压缩格式）
+
+read_chunks 返回原始列名和逐块产生的原始数据，调用方（见 data.WorkbookCache）每读到一块就
+检查并转换为紧凑的列类型，原始的 object 列不会整表留在内存中。
+CSV/TSV 按 CHUNK_ROWS 行分块流式读取，只读取前三列，类别列直接读为 category；
+Excel 无法分块解析，按工作表逐个读取。
+"""
+import os
+
+import pandas as pd
+
+from .options import SHEET_MODES
+
+# CSV/TSV 每块读取的行数
+CHUNK_ROWS = 200_000
+
+COMPRESSION_SUFFIXES = ('.gz', '.bz2', '.xz', '.zip')
+DELIMITERS = {'.csv': ',', '.tsv': '\t', '.tab': '\t'}
+
+# 中文CSV常见的编码，依次尝试
+ENCODINGS = ('utf-8-sig', 'gb18030')
+
+# 每个工作表一个时期时，工作表名所在列的列名
+PERIOD_COLUMN = "时期（工作表）"
+
+
+def strip_compression(path):
+    """去掉 .gz 等压缩格式的扩展名"""
+    for suffix in COMPRESSION_SUFFIXES:
+        if path.lower().endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def delimiter(path):
+    """CSV/TSV 文件的分隔符；不是文本表格时返回 None"""
+    return DELIMITERS.get(os.path.splitext(strip_compression(path))[1].lower())
+
+
+def read_chunks(path, nrows=None, sheets='auto', chunk_rows=CHUNK_ROWS):
+    """读取数据文件，返回 (原始列名, 原始数据块的迭代器)
+
+    指定 nrows 时只读取表头和前 nrows 行（多个工作表时为每个工作表的前 nrows 行）。
+    sheets 为 SHEET_MODES 中的工作表处理方式，对 CSV/TSV 无效。
+    """
+    if sheets not in SHEET_MODES:
+        raise ValueError(f"不支持的工作表处理方式: {sheets}（可选: {', '.join(SHEET_MODES)}）")
+    sep = delimiter(path)
+    if sep is not None:
+        return _read_text(path, sep, nrows, chunk_rows)
+    return _read_workbook(path, nrows, sheets)
+
+
+def _detect_encoding(path, sep):
+    for encoding in ENCODINGS[:-1]:
+        try:
+            pd.read_csv(path, sep=sep, nrows=1000, encoding=encoding)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    return ENCODINGS[-1]
+
+
+def _read_text(path, sep, nrows, chunk_rows):
+    encoding = _detect_encoding(path, sep)
+    columns = list(pd.read_csv(path, sep=sep, nrows=0, encoding=encoding).columns)
+    if len(columns) < 3:
+        # 列数不足时交给清洗步骤报错
+        return columns, iter([pd.DataFrame(columns=columns)])
+
+    reader = pd.read_csv(path, sep=sep, encoding=encoding, encoding_errors='replace', usecols=[0, 1, 2],
+                         dtype={columns[1]: 'category'}, nrows=nrows, chunksize=chunk_rows)
+
+    def chunks():
+        with reader:
+            yield from reader
+
+    return columns, chunks()
+
+
+def sheet_mode(headers):
+    """自动判断工作表的处理方式，headers 为 {工作表名: 列名列表}
+
+    工作表名都是数字且只有两列（类别、数值）时每个工作表为一个时期；
+    各工作表的表头与第一个相同时合并全部工作表；否则只读取第一个工作表。
+    """
+    names = list(headers)
+    if len(names) < 2:
+        return 'first'
+    if all(pd.notna(pd.to_numeric(name, errors='coerce')) for name in names) and len(headers[names[0]]) == 2:
+        return 'periods'
+    first = headers[names[0]]
+    if len(first) >= 3 and all(headers[name] == first for name in names[1:]):
+        return 'concat'
+    return 'first'
+
+
+def _read_workbook(path, nrows, sheets):
+    book = pd.ExcelFile(path)
+    names = book.sheet_names
+    if sheets == 'auto':
+        sheets = sheet_mode({name: list(book.parse(name, nrows=0).columns) for name in names})
+    if sheets == 'first':
+        names = names[:1]
+
+    # 第一个工作表用于确定列名，交给调用方后即释放
+    pending = {names[0]: book.parse(names[0], nrows=nrows)}
+    columns = list(pending[names[0]].columns)
+    if sheets == 'periods':
+        columns = [PERIOD_COLUMN] + columns
+
+    def chunks():
+        with book:
+            for name in names:
+                sheet = pending.pop(name, None)
+                if sheet is None:
+                    sheet = book.parse(name, nrows=nrows)
+                if sheets == 'periods':
+                    sheet.insert(0, PERIOD_COLUMN, name)
+                # 各工作表按位置对应到第一个工作表的列
+                width = min(3, len(columns), sheet.shape[1])
+                if list(sheet.columns[:width]) != columns[:width]:
+                    sheet = sheet.iloc[:, :width].set_axis(columns[:width], axis=1)
+                yield sheet
+
+    return columns, chunks()
@@ -0,0 +1,54 @@
+"""渲染过程中的实时预览
+
+渲染线程把缩小后的帧写入有界环形缓冲区，界面线程按固定刷新率取出并播放，
+用户在渲染的第一秒就能看到标题、列的对应关系是否正确，发现错误可以立即取消。
+本模块只依赖标准库，界面启动时导入不会加载 numpy 和 PIL。
+"""
+import collections
+import threading
+import time
+
+LIVE_WIDTH = 480
+LIVE_FPS = 8
+LIVE_CAPACITY = 8
+
+
+class LiveFrames:
+    """渲染线程与界面线程之间的有界环形缓冲区
+
+    渲染线程在 due() 为真时才缩小并 push() 一帧，即每秒最多 max_fps 帧，其余帧不做任何处理；
+    缓冲区最多保存 capacity 帧，界面来不及取出时丢弃最旧的帧，渲染不会因界面而变慢。
+    每帧为 (帧序号, (宽, 高), RGB字节)，界面线程用 pop() 按顺序取出。
+    """
+
+    def __init__(self, width=LIVE_WIDTH, max_fps=LIVE_FPS, capacity=LIVE_CAPACITY):
+        self.width = width
+        self.interval = 1.0 / max_fps
+        self._frames = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    @property
+    def interval_ms(self):
+        """界面的刷新间隔（毫秒）"""
+        return max(1, round(self.interval * 1000))
+
+    def start(self):
+        """开始一段新的动画，第一帧立即写入"""
+        self._next = 0.0
+
+    def due(self):
+        """距上一次写入是否已超过刷新间隔"""
+        return time.monotonic() >= self._next
+
+    def push(self, index, image):
+        """写入第 index 帧缩小后的RGB图像"""
+        self._next = time.monotonic() + self.interval
+        item = (index, image.size, image.tobytes())
+        with self._lock:
+            self._frames.append(item)
+
+    def pop(self):
+        """取出最早的一帧，缓冲区为空时返回 None"""
+        with self._lock:
+            return self._frames.popleft() if self._frames else None
@@ -0,0 +1,24 @@
+"""界面和命令行共用的选项常量
+
+只依赖标准库，图形界面启动时可以立即导入，不必先加载 pandas 和 matplotlib。
+"""
+
+# 动画输出格式
+VIDEO_FORMATS = ('mp4', 'webm')
+FORMATS = ('gif',) + VIDEO_FORMATS
+
+# 重复的 (年份, 类别) 行的合并方式
+AGGREGATIONS = {
+    'sum': "求和",
+    'mean': "平均",
+    'max': "最大值",
+    'last': "最后一行",
+}
+
+# 工作簿中有多个工作表时的处理方式
+SHEET_MODES = {
+    'auto': "自动",
+    'first': "仅第一个",
+    'concat': "全部合并",
+    'periods': "每表一期",
+}
@@ -0,0 +1,70 @@
+"""多进程逐帧渲染
+
+每个子进程用相同的构造参数重建一份 BarRace（各自持有独立的 Agg 画布），
+按连续的帧区间渲染并以原始 RGBA 字节返回，主进程按帧序重新拼接。
+由于每帧只依赖预先算好的插值数组，并行输出与单进程逐字节相同。
+有界的提交与按序取回由 imap_bounded 完成，每年快照的并行导出（见 snapshots 模块）也使用它。
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .fonts import apply_font_state, font_state
+
+_race = None
+
+
+def _init_worker(init_args, init_kwargs, fonts):
+    global _race
+    from .barrace import BarRace
+    apply_font_state(fonts)
+    _race = BarRace(*init_args, **init_kwargs)
+
+
+def _render_chunk(start, stop):
+    return b''.join(_race.draw_frame(i).tobytes() for i in range(start, stop))
+
+
+def default_workers():
+    """默认的并行进程数：CPU核数"""
+    return os.cpu_count() or 1
+
+
+def imap_bounded(func, arg_tuples, workers, initializer=None, initargs=()):
+    """在进程池中依次计算 func(*args)，按提交顺序逐个产生结果
+
+    同时在途的任务数限制为进程数的两倍，内存占用与任务总数无关。
+    生成器提前关闭时取消尚未开始的任务并等待进程池结束。
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs)
+    try:
+        pending = deque()
+        for args in arg_tuples:
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, *args))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def render_frames(race, ranges, workers, chunk_size=8):
+    """在进程池中渲染 race 的若干帧区间 [(start, stop), ...]，按顺序逐帧生成RGBA数组（见 imap_bounded）"""
+    shape = np.asarray(race.canvas.buffer_rgba()).shape
+    frame_bytes = int(np.prod(shape))
+    fonts = font_state()
+    chunks = [(i, min(i + chunk_size, stop)) for start, stop in ranges for i in range(start, stop, chunk_size)]
+    if not chunks:
+        return
+
+    results = imap_bounded(_render_chunk, chunks, workers, _init_worker,
+                           (race.init_args, race.init_kwargs, fonts))
+    try:
+        for data in results:
+            for offset in range(0, len(data), frame_bytes):
+                yield np.frombuffer(data, dtype=np.uint8, count=frame_bytes, offset=offset).reshape(shape)
+    finally:
+        results.close()
@@ -0,0 +1,105 @@
+"""渲染时顺带生成的预览图
+
+界面不再打开并缩放完整的输出文件（静态图表可达数千万像素）：渲染器写出第一帧时
+就生成一张宽度不超过 PREVIEW_WIDTH 的缩略图（PNG字节），界面直接显示即可；
+需要时还按固定间隔抽帧，写出一个低分辨率的预览动画，或把缩小后的帧实时交给界面播放（见 live.py）。
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+PREVIEW_WIDTH = 700
+ANIMATION_WIDTH = 360
+
+
+def thumbnail(image, width=PREVIEW_WIDTH):
+    """把PIL图像缩小到指定宽度（不放大）"""
+    if image.width <= width:
+        return image
+    height = max(round(image.height * width / image.width), 1)
+    return image.resize((width, height), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+
+def frame_image(frame):
+    """(高 × 宽 × 4) 的RGBA帧转为RGB图像"""
+    height, width = frame.shape[:2]
+    return Image.frombuffer('RGBA', (width, height), np.ascontiguousarray(frame), 'raw', 'RGBA', 0, 1).convert('RGB')
+
+
+def png_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='png')
+    return buffer.getvalue()
+
+
+class PreviewWriter:
+    """从渲染中的帧生成预览：thumbnail 为第一帧的缩略图（PNG字节）
+
+    animation_path 不为空时，另外每隔若干帧抽取一帧（最多 max_frames 帧），
+    close() 时写成宽 ANIMATION_WIDTH 的低分辨率GIF。
+    live 为 LiveFrames 时，按其刷新率把缩小后的帧写入缓冲区供界面实时播放。
+    """
+
+    def __init__(self, fps=2, animation_path=None, width=PREVIEW_WIDTH, max_frames=60, live=None):
+        self.fps = fps
+        self.animation_path = animation_path
+        self.width = width
+        self.max_frames = max_frames
+        self.live = live
+        self.thumbnail = None
+        self.outputs = []
+        self.stride = 1
+        self._total = 0
+        self._frames = []
+
+    def start(self, n_frames):
+        """开始一段 n_frames 帧的动画"""
+        self._total = n_frames
+        self.stride = max(1, -(-n_frames // self.max_frames))
+        self._frames = []
+        if self.live is not None:
+            self.live.start()
+
+    def write(self, index, frame):
+        """第 index 帧（RGBA数组）已渲染"""
+        last = index == self._total - 1
+        sample = self.animation_path and (index % self.stride == 0 or last)
+        # 最后一帧总是送给界面，实时预览停在最终的排名上
+        live = self.live is not None and (last or self.live.due())
+        if self.thumbnail is not None and not sample and not live:
+            return
+        image = frame_image(frame)
+        if live:
+            self.live.push(index, thumbnail(image, self.live.width))
+        if self.thumbnail is None:
+            self.thumbnail = png_bytes(thumbnail(image, self.width))
+        if sample:
+            self._frames.append(thumbnail(image, ANIMATION_WIDTH))
+
+    def add_figure(self, figure, **save_kwargs):
+        """尚无缩略图时，以低分辨率重新绘制 matplotlib 图表作为缩略图"""
+        if self.thumbnail is not None:
+            return
+        buffer = io.BytesIO()
+        save_kwargs['dpi'] = self.width / figure.get_figwidth()
+        figure.savefig(buffer, format='png', **save_kwargs)
+        buffer.seek(0)
+        self.thumbnail = png_bytes(thumbnail(Image.open(buffer).convert('RGB'), self.width))
+
+    def add_file(self, path):
+        """尚无缩略图时，由已保存的图片或GIF的第一帧生成缩略图"""
+        if self.thumbnail is not None:
+            return
+        with Image.open(path) as image:
+            image.draft('RGB', (self.width, self.width))
+            self.thumbnail = png_bytes(thumbnail(image.convert('RGB'), self.width))
+
+    def close(self):
+        """写出预览动画（如有）"""
+        if self.animation_path and self._frames:
+            duration = round(1000 * self.stride / self.fps)
+            self._frames[0].save(self.animation_path, save_all=True, append_images=self._frames[1:],
+                                 duration=duration, loop=0)
+            self.outputs.append(self.animation_path)
+        self._frames = []
@@ -0,0 +1,184 @@
+"""按阶段记录渲染耗时和内存
+
+渲染开始前由调用方激活一个 Profiler，各阶段的代码用 stage('名称') 包裹即可记录
+墙钟时间、CPU时间（含已结束的子进程）和该阶段内的峰值内存；没有激活的 Profiler 时
+stage() 不做任何事。阶段内的峰值在 Linux 上由 /proc/self/clear_refs 在阶段开始时重置 VmHWM 得到，
+无法重置时（其他系统）只能记录当时的进程峰值，显示为“进程峰值内存”。结果可显示在状态栏，也可追加到本地的 JSON Lines 日志中。
+激活时指定 cprofile_path 还会用 cProfile 分析整个渲染过程并保存统计文件。
+"""
+import contextlib
+import cProfile
+import json
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 默认的性能日志文件（每行一次渲染）
+PROFILE_LOG = "exceltorace_profile.jsonl"
+
+STAGE_NAMES = {
+    'startup': "启动到可交互",
+    'warmup': "后台加载",
+    'read': "读取",
+    'validate': "检查",
+    'clean': "清洗",
+    'aggregate': "合并重复",
+    'pivot': "透视",
+    'animate': "准备动画",
+    'save': "保存动画",
+    'snapshots': "每年快照",
+    'static': "静态图表",
+    'preview': "预览",
+}
+
+_active = threading.local()
+
+# 所有线程中正在进行的阶段，重置 VmHWM 前先把当前峰值计入它们
+_open_stages = []
+_peak_lock = threading.Lock()
+# 重置 VmHWM 之前观察到的进程峰值（MB），重置后 ru_maxrss 也会随之变小
+_process_peak = 0.0
+
+
+def _child_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_mb():
+    """当前进程自启动以来的峰值内存（MB），无法获取时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    peak = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    return max(peak, _process_peak)
+
+
+def _hwm_mb():
+    """上次重置以来的峰值内存 VmHWM（MB），不是 Linux 时返回 None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _begin_peak(state):
+    """开始记录一个阶段的峰值内存，无法按阶段记录时返回 False"""
+    global _process_peak
+    with _peak_lock:
+        hwm = _hwm_mb()
+        if hwm is None:
+            return False
+        _process_peak = max(_process_peak, hwm)
+        for other in _open_stages:
+            other['peak'] = max(other['peak'], hwm)
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            return False
+        state['peak'] = 0.0
+        _open_stages.append(state)
+        return True
+
+
+def _end_peak(state):
+    """结束一个阶段，返回该阶段内的峰值内存（MB）"""
+    global _process_peak
+    with _peak_lock:
+        hwm = _hwm_mb() or 0.0
+        _process_peak = max(_process_peak, hwm)
+        for other in _open_stages:
+            other['peak'] = max(other['peak'], hwm)
+        _open_stages.remove(state)
+        return state['peak']
+
+
+class Profiler:
+    """一次渲染的分阶段统计"""
+
+    def __init__(self, cprofile_path=None):
+        self.cprofile_path = cprofile_path
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """记录一个阶段；同名阶段多次出现时分别记录"""
+        state = {}
+        scoped = _begin_peak(state)
+        wall = time.perf_counter()
+        cpu = time.process_time() + _child_cpu()
+        try:
+            yield
+        finally:
+            record = {
+                'stage': name,
+                'wall': round(time.perf_counter() - wall, 4),
+                'cpu': round(time.process_time() + _child_cpu() - cpu, 4),
+                'peak_rss_mb': round(_end_peak(state), 1) if scoped else None,
+            }
+            if not scoped and resource is not None:
+                record['process_peak_rss_mb'] = round(peak_rss_mb(), 1)
+            self.stages.append(record)
+
+    @contextlib.contextmanager
+    def activate(self):
+        """在当前线程中激活，期间 stage() 的记录都归入本对象"""
+        previous = getattr(_active, 'profiler', None)
+        _active.profiler = self
+        profile = cProfile.Profile() if self.cprofile_path else None
+        if profile is not None:
+            profile.enable()
+        try:
+            yield self
+        finally:
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(self.cprofile_path)
+            _active.profiler = previous
+
+    @property
+    def total_wall(self):
+        return sum(record['wall'] for record in self.stages)
+
+    def summary(self):
+        """适合显示在状态栏的多行文本"""
+        lines = []
+        for record in self.stages:
+            line = f"{STAGE_NAMES.get(record['stage'], record['stage'])} {record['wall']:.2f}s（CPU {record['cpu']:.2f}s"
+            if record['peak_rss_mb'] is not None:
+                line += f"，峰值内存 {record['peak_rss_mb']:.0f}MB"
+            elif record.get('process_peak_rss_mb') is not None:
+                line += f"，进程峰值内存 {record['process_peak_rss_mb']:.0f}MB"
+            lines.append(line + "）")
+        lines.append(f"合计 {self.total_wall:.2f}s")
+        if self.cprofile_path:
+            lines.append(f"cProfile 统计已保存为 {self.cprofile_path}")
+        return "\n".join(lines)
+
+    def append_log(self, log_path=PROFILE_LOG, **info):
+        """把本次统计追加为 JSON Lines 日志的一行，info 为附加字段（如输入输出文件）"""
+        record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), **info,
+                  'stages': self.stages, 'total_wall': round(self.total_wall, 4)}
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def stage(name):
+    """在当前线程激活的 Profiler 中记录一个阶段；未激活时不做任何事"""
+    profiler = getattr(_active, 'profiler', None)
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name)
@@ -0,0 +1,365 @@
+"""不依赖图形界面的渲染核心"""
+import os
+
+import matplotlib
+matplotlib.use('Agg')  # 使用Agg后端，不需要GUI
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from .barrace import BarRace
+from .data import TopNIndex, _noop_report, load_entry, pivot_frame
+from .fonts import ensure_fonts
+from .framecache import FrameCache, frame_cache_dir
+from .options import AGGREGATIONS
+from .preview import PreviewWriter
+from .profiling import Profiler, stage
+from .snapshots import export_snapshots, open_sink
+from .sparse import SparseFrame
+from .worker import RenderCancelled
+
+
+def create_animation(df, out_path, title, fps, year_pngs=False, report=_noop_report, df_pivot=None,
+                     engine='native', steps_per_unit=1, workers=1, crf=None, bitrate=None,
+                     snapshot_format='png', frame_cache=False, easing='linear', per_period=False, top_n=10,
+                     preview=None):
+    """创建动态条形图，返回生成的文件列表
+
+    输出格式由 out_path 的扩展名决定（gif/mp4/webm），视频格式可用 crf 或 bitrate 控制质量。
+    engine 为 'native'（内置的 BarRace 引擎）或 'pynimate'；steps_per_unit 为内置引擎
+    每个时间单位（如一年）的帧数（per_period 为真时为每个时期的帧数），easing 为插值的缓动函数
+    （见 barrace.EASINGS），top_n 为内置引擎每帧显示的条形数，workers 为内置引擎并行渲染帧、以及并行保存每年PNG的进程数。
+    report 会在每渲染一帧后被调用一次，抛出异常即可中止渲染。
+    year_pngs 为真时另外导出每年的快照，snapshot_format 为其输出方式（png/zip/sprite）。
+    frame_cache 为真时内置引擎使用输出文件旁的帧缓存，只重新绘制输入有变化的区段。
+    df_pivot 为已缓存的透视表（内置引擎也可以是 SparseFrame），省略时由 df 计算：
+    内置引擎使用稀疏表示，不生成 时期数 × 实体数 的稠密宽表。
+    preview 为 PreviewWriter 时在渲染的同时生成缩略图（pynimate 引擎由保存后的GIF第一帧生成）。
+    """
+    # 确保图表使用正确的中文字体（每个进程只解析一次），帧缓存的键也包含字体设置
+    ensure_fonts()
+
+    # 数据预处理
+    if df_pivot is None:
+        with stage('pivot'):
+            df_pivot = pivot_frame(df) if engine == 'pynimate' else SparseFrame.from_long(df)
+
+    progress = _frame_progress(report, 50, 90 if year_pngs else 100)
+    if engine == 'pynimate':
+        _save_pynimate_animation(df_pivot, out_path, title, fps, progress)
+        if preview is not None and out_path.lower().endswith('.gif'):
+            preview.add_file(out_path)
+    else:
+        with stage('animate'):
+            race = BarRace(df_pivot, title, n_bars=top_n, steps_per_unit=steps_per_unit, easing=easing,
+                           per_period=per_period)
+            cache = FrameCache(frame_cache_dir(out_path)) if frame_cache else None
+        with stage('save'):
+            summary = race.save(out_path, fps, progress, workers=workers, crf=crf, bitrate=bitrate, cache=cache,
+                                preview=preview)
+        if cache is not None:
+            report(cache.summary)
+        if summary:
+            report(summary)
+
+    if preview is not None:
+        preview.close()
+        for path in preview.outputs:
+            report(f"预览动画已保存为 {path}")
+
+    outputs = [out_path]
+    if year_pngs:
+        with stage('snapshots'):
+            outputs.extend(create_year_pngs(df, os.path.splitext(out_path)[0], title, report, workers,
+                                            snapshot_format))
+    return outputs
+
+
+def _save_pynimate_animation(df_pivot, out_path, title, fps, progress_callback):
+    """使用pynimate创建并保存动态条形图"""
+    with stage('animate'):
+        cnv = _build_pynimate_canvas(df_pivot, title)
+
+    # 保存动画（pynimate 会自行追加扩展名）
+    with stage('save'):
+        stem, extension = os.path.splitext(out_path)
+        cnv.save(stem, fps=fps, extension=extension.lstrip('.'), progress_callback=progress_callback)
+
+
+def _build_pynimate_canvas(df_pivot, title):
+    import pynimate as nim
+
+    # 创建Canvas和BarDatafier对象
+    cnv = nim.Canvas(figsize=(15, 8))
+
+    datafier = nim.BarDatafier(
+        df_pivot,
+        time_format="%Y",
+        ip_freq="YE"
+    )
+
+    # 创建Barhplot对象
+    bar = nim.Barhplot(datafier)
+
+    # 设置时间标签回调函数
+    bar.set_time(callback=lambda i, datafier: f"{datafier.data.index[i].year}年")
+
+    # 设置标题
+    bar.set_title(title)
+
+    # 设置标签
+    bar.set_xlabel('数值')
+
+    # 添加到Canvas并创建动画
+    cnv.add_plot(bar)
+    cnv.animate()
+    return cnv
+
+
+def _frame_progress(report, start, end):
+    """把 matplotlib 的逐帧保存回调转换为 report 调用"""
+    def callback(current_frame, total_frames):
+        total = total_frames or current_frame + 1
+        report(f"正在渲染动画帧 {current_frame + 1}/{total}",
+               start + (end - start) * (current_frame + 1) / total)
+    return callback
+
+
+def create_year_pngs(df, output_filename, title, report=_noop_report, workers=1, snapshot_format='png'):
+    """为每一年创建静态PNG图表，返回生成的文件列表
+
+    所有年份共用一个图表模板逐年更新，workers > 1 时并行渲染；snapshot_format 选择输出方式：
+    png 为逐年的 <output_filename>_<年份>.png，zip 为单个ZIP包，sprite 为拼图（见 snapshots 模块）。
+    """
+    ensure_fonts()
+    # 一次排序得到每年的前15名
+    top = TopNIndex(df, 15)
+
+    def progress(label, done, total):
+        report(f"正在生成 {label} 的PNG图表 ({done + 1}/{total})", 90 + 10 * done / total)
+
+    return export_snapshots(top, title, open_sink(snapshot_format, output_filename, len(top)), progress, workers)
+
+
+# 静态图表每页的年份数；每页单独绘制、保存并释放，内存占用与年份总数无关
+STATIC_PANELS_PER_PAGE = 6
+
+
+def static_page_paths(static_path, n_pages):
+    """分页输出的文件名：只有一页或输出PDF时为 static_path 本身，否则为带页码的PNG序列"""
+    if n_pages <= 1 or static_path.lower().endswith('.pdf'):
+        return [static_path]
+    stem, ext = os.path.splitext(static_path)
+    return [f"{stem}_p{page:02d}{ext}" for page in range(1, n_pages + 1)]
+
+
+def create_static_charts(df, static_path, title, style='basic', report=_noop_report,
+                         per_page=STATIC_PANELS_PER_PAGE, preview=None):
+    """创建静态图表作为备选方案，返回写出的文件列表
+
+    每页最多 per_page 个年份：static_path 以 .pdf 结尾时写成一个多页PDF，
+    否则年份超过一页时写成 <名称>_p01.png、<名称>_p02.png ... 的PNG序列。
+    preview 为 PreviewWriter 时以低分辨率重新绘制第一页作为缩略图。
+    """
+    # 确保图表使用正确的中文字体（每个进程只解析一次）
+    ensure_fonts()
+
+    if style == 'pro':
+        # 一次排序得到每年的前15名
+        top = TopNIndex(df, 15)
+        # 设置美观的风格（仅作用于本次绘图，避免批量渲染时影响后续图表）
+        with plt.style.context('seaborn-v0_8-pastel'):
+            return _save_static_pages(top, static_path, title, report, per_page,
+                                      _new_page_pro, _draw_panel_pro, dict(dpi=120, bbox_inches='tight'), preview)
+    # 一次排序得到每年的前10名
+    top = TopNIndex(df, 10)
+    return _save_static_pages(top, static_path, title, report, per_page,
+                              _new_page_basic, _draw_panel_basic, {}, preview)
+
+
+def _save_static_pages(top, static_path, title, report, per_page, new_page, draw_panel, save_kwargs, preview=None):
+    years = top.years
+    if not len(years):
+        raise ValueError("没有可绘制的年份，未生成静态图表")
+    per_page = max(1, per_page)
+    page_starts = range(0, len(years), per_page)
+    paths = static_page_paths(static_path, len(page_starts))
+    pdf = PdfPages(static_path) if static_path.lower().endswith('.pdf') else None
+
+    try:
+        for page, start in enumerate(page_starts):
+            page_years = years[start:start + per_page]
+            fig, axes = new_page(len(page_years), title)
+
+            for offset, year in enumerate(page_years):
+                i = start + offset
+                label = top.labels[i]
+                report(f"正在绘制 {label} 的静态图表 ({i + 1}/{len(years)})", 70 + 25 * i / len(years))
+                draw_panel(axes[offset], label, top[year])
+
+            plt.tight_layout(rect=[0, 0, 1, 0.96])
+            if pdf is not None:
+                pdf.savefig(fig, **save_kwargs)
+            else:
+                fig.savefig(paths[page], **save_kwargs)
+            if preview is not None:
+                preview.add_figure(fig, **save_kwargs)
+            # 保存后立即释放本页，再绘制下一页
+            plt.close(fig)
+    finally:
+        if pdf is not None:
+            pdf.close()
+    return paths
+
+
+def _new_page_basic(n_panels, title):
+    # 为本页的每一年创建一个条形图
+    fig, axes = plt.subplots(n_panels, 1, figsize=(12, 5*n_panels))
+    fig.suptitle(title, fontsize=16)
+
+    # 如果只有一年数据，确保axes是可迭代的
+    if n_panels == 1:
+        axes = [axes]
+    return fig, axes
+
+
+def _draw_panel_basic(ax, label, year_data):
+    # 创建水平条形图
+    bars = ax.barh(year_data['country'][::-1], year_data['gdp'][::-1])
+
+    # 添加数值标签
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width + (width*0.02), bar.get_y() + bar.get_height()/2,
+                f'{width:,.0f}', ha='left', va='center')
+
+    # 设置标题和标签
+    ax.set_title(label, fontsize=14)
+    ax.set_xlabel('数值', fontsize=12)
+
+
+def _new_page_pro(n_panels, title):
+    # 为本页的每一年创建一个条形图
+    fig, axes = plt.subplots(n_panels, 1, figsize=(16, 5*n_panels), dpi=120)
+    fig.patch.set_facecolor('#f8f8f8')  # 设置图表背景色
+    fig.suptitle(title, fontsize=24, fontweight='bold')
+
+    # 添加水印
+    fig.text(0.95, 0.05, '数据来源: Excel导入',
+             fontsize=12, color='gray', alpha=0.5,
+             ha='right', va='bottom')
+
+    # 如果只有一年数据，确保axes是可迭代的
+    if n_panels == 1:
+        axes = [axes]
+    return fig, axes
+
+
+def _draw_panel_pro(ax, label, year_data):
+    # 颜色映射，使图表更美观
+    cmap = plt.cm.viridis
+
+    # 创建水平条形图
+    bars = ax.barh(year_data['country'][::-1], year_data['gdp'][::-1],
+                   color=[cmap(j/15) for j in range(len(year_data))],
+                   edgecolor='white', alpha=0.9, height=0.7)
+
+    # 添加数值标签
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width + (width*0.01), bar.get_y() + bar.get_height()/2,
+                f'{width:,.0f}', ha='left', va='center', fontsize=12,
+                fontweight='bold')
+
+    # 设置标题和标签
+    ax.set_title(label, fontsize=20, pad=20)
+    ax.set_xlabel('GDP (单位: 亿美元)', fontsize=14)
+
+    # 去掉顶部和右侧边框
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+
+    # 设置背景颜色
+    ax.set_facecolor('#f8f8f8')
+
+    # 添加网格线
+    ax.grid(axis='x', linestyle='--', alpha=0.3)
+
+    # 设置y轴标签字体
+    for label in ax.get_yticklabels():
+        label.set_fontsize(12)
+
+    # 设置x轴刻度格式
+    ax.xaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f'{x:,.0f}'))
+
+
+def render_dataframe(df, output_filename, title, fps, style='basic', report=_noop_report, df_pivot=None,
+                     fmt='gif', static_format='png', per_page=STATIC_PANELS_PER_PAGE, animated_preview=False,
+                     live_preview=None, **options):
+    """渲染已清洗的数据：优先生成动画，失败时退回静态图表
+
+    返回字典：kind 为 'animation' 或 'static'，path 为主输出文件，
+    snapshots 为每年的PNG列表，pages 为静态图表的全部分页文件，error 为动画失败的原因（如有），
+    preview 为渲染时生成的缩略图（PNG字节，界面可直接显示，无法生成时为 None），
+    previews 为预览动画文件列表（animated_preview 为真时输出 <名称>_preview.gif）。
+    live_preview 为 LiveFrames 时，渲染中的帧缩小后实时写入其中，供界面边渲染边播放。
+    fmt 为动画格式（gif/mp4/webm），static_format 为静态图表格式（png/pdf），per_page 为静态图表每页的年份数，
+    options 原样传给 create_animation（如 engine、steps_per_unit）。
+    """
+    report("正在准备动画数据...", 50)
+    out_path = f"{output_filename}.{fmt}"
+    preview = PreviewWriter(fps, f"{output_filename}_preview.gif" if animated_preview else None, live=live_preview)
+
+    try:
+        # 尝试创建动画
+        outputs = create_animation(df, out_path, title, fps, year_pngs=(style == 'pro'), report=report,
+                                   df_pivot=df_pivot, preview=preview, **options)
+        report(f"动画已创建并保存为 {out_path}", 100)
+        return {'kind': 'animation', 'path': out_path, 'snapshots': outputs[1:], 'pages': [], 'error': None,
+                'preview': preview.thumbnail, 'previews': preview.outputs}
+    except RenderCancelled:
+        raise
+    except Exception as e:
+        report(f"创建动画失败，正在创建静态图表: {str(e)}", 70)
+
+        # 备选方案：创建静态图表
+        preview = PreviewWriter(fps)
+        with stage('static'):
+            pages = create_static_charts(df, f"{output_filename}_static.{static_format}", title, style, report,
+                                         per_page, preview)
+        if len(pages) > 1:
+            report(f"静态图表已分 {len(pages)} 页保存为 {pages[0]} 等文件", 100)
+        else:
+            report(f"静态图表已保存为 {pages[0]}", 100)
+        return {'kind': 'static', 'path': pages[0], 'snapshots': [], 'pages': pages, 'error': str(e),
+                'preview': preview.thumbnail, 'previews': []}
+
+
+def render_file(path, output_filename, title, fps, style='basic', report=_noop_report, profiler=None,
+                aggregate='sum', sheets='auto', **options):
+    """读取数据文件并渲染，返回值同 render_dataframe，另外 profile 为记录了各阶段耗时和内存的 Profiler，
+    merged_rows 为合并掉的重复行数
+
+    重复的 (年份, 类别) 行按 aggregate（sum/mean/max/last，见 options.AGGREGATIONS）合并后再生成动画。
+    sheets 为工作簿有多个工作表时的处理方式（见 options.SHEET_MODES）。
+    可传入自己的 profiler（如指定了 cprofile_path 的 Profiler），省略时新建一个。
+    """
+    if profiler is None:
+        profiler = Profiler()
+    with profiler.activate():
+        entry = load_entry(path, report, sheets=sheets)
+        with stage('aggregate'):
+            frame, merged = entry.aggregated(aggregate)
+        if merged:
+            # 合并后的数据每次渲染时重新计算透视表
+            report(f"已按{AGGREGATIONS[aggregate]}合并 {merged} 行重复的 (年份, 类别) 数据", 40)
+            df_pivot = None
+        else:
+            with stage('pivot'):
+                # 只有 pynimate 需要稠密透视表，内置引擎使用稀疏表示
+                if options.get('engine') == 'pynimate':
+                    df_pivot = entry.pivot()
+                else:
+                    df_pivot = entry.sparse()
+        result = render_dataframe(frame, output_filename, title, fps, style, report, df_pivot, **options)
+    result['merged_rows'] = merged
+    result['profile'] = profiler
+    return result
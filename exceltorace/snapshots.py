@@ -0,0 +1,280 @@
+"""每年快照图片的导出流水线
+
+所有年份共用同一张图和同一组条形/文字对象（SnapshotFigure），逐年只更新条形宽度、
+类别名和数值标签后编码为PNG，省去每年重新创建图表、查找字体和布局的开销。
+年份较多时按区间分给多个进程并行渲染和编码，每个进程各自持有一份模板。
+
+编码好的图片经有界队列交给写入线程，由可替换的输出目标（sink）保存：
+逐个PNG文件、单个ZIP包、拼图（sprite sheet），或留在内存中。写入与渲染同时进行，
+队列满时渲染端等待，内存占用与年份总数无关。
+"""
+import io
+import json
+import os
+import queue
+import threading
+import zipfile
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+from .data import period_key
+from .fonts import apply_font_state, font_state
+from .parallel import imap_bounded
+
+SNAPSHOT_FORMATS = ('png', 'zip', 'sprite')
+
+_template = None
+
+
+class SnapshotFigure:
+    """每年快照共用的图表模板，最多显示 n_bars 个条形"""
+
+    def __init__(self, title, n_bars=15, figsize=(15, 8), xlabel='GDP (单位: 亿美元)'):
+        self.title = title
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.ax.set_xlabel(xlabel)
+
+        # 条形和数值标签只创建一次，逐年更新
+        slots = np.arange(n_bars)
+        self.bars = self.ax.barh(slots, np.zeros(n_bars)).patches
+        self.labels = [self.ax.text(0, y, '', ha='left', va='center') for y in slots]
+
+    def update(self, period, names, values):
+        """把模板更新为某一年的数据，period 为时期的显示文字，names/values 按数值降序排列"""
+        n = len(values)
+        ax = self.ax
+
+        # 第一名在最上方
+        for slot, (bar, label) in enumerate(zip(self.bars, self.labels)):
+            visible = slot < n
+            bar.set_visible(visible)
+            label.set_visible(visible)
+            if not visible:
+                continue
+            width = float(values[n - 1 - slot])
+            bar.set_width(width)
+            label.set_position((width + (width*0.01), slot))
+            label.set_text(f'{width:,.0f}')
+
+        ax.set_yticks(np.arange(n), list(names[::-1]))
+
+        # 与自动缩放一致：从0开始，两端各留5%的边距
+        low = min(0.0, float(np.min(values))) if n else 0.0
+        high = max(0.0, float(np.max(values))) if n else 1.0
+        span = (high - low) or 1.0
+        ax.set_xlim(low - (0.05 * span if low < 0 else 0), high + 0.05 * span)
+        margin = 0.05 * (n - 0.2)
+        ax.set_ylim(-0.4 - margin, n - 0.6 + margin)
+
+        ax.set_title(f'{self.title} - {period}')
+
+    def render(self, period, names, values):
+        """更新为某一年的数据并编码为PNG字节"""
+        self.update(period, names, values)
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format='png')
+        return buffer.getvalue()
+
+
+def _init_worker(title, fonts):
+    global _template
+    apply_font_state(fonts)
+    _template = SnapshotFigure(title)
+
+
+def _render_chunk(items):
+    return [_template.render(*item) for item in items]
+
+
+def iter_snapshots(top, title, workers=1, chunk_size=16):
+    """按年份顺序生成 (时期的文件名文字, PNG字节)，可直接用于嵌入而不落盘（见 data.period_key）
+
+    top 为 TopNIndex；workers > 1 时在进程池中按区间并行渲染（见 parallel.imap_bounded）。
+    """
+    items = [(label, year_data['country'].astype(str).tolist(), year_data['gdp'].to_numpy())
+             for label, (year, year_data) in zip(top.labels, top)]
+    keys = [period_key(year) for year in top.years]
+
+    if workers <= 1 or len(items) <= chunk_size:
+        template = SnapshotFigure(title)
+        for key, item in zip(keys, items):
+            yield key, template.render(*item)
+        return
+
+    chunks = [(items[i:i + chunk_size],) for i in range(0, len(items), chunk_size)]
+    results = imap_bounded(_render_chunk, chunks, workers, _init_worker, (title, font_state()))
+    keys = iter(keys)
+    try:
+        for images in results:
+            for data in images:
+                yield next(keys), data
+    finally:
+        results.close()
+
+
+class PngFilesSink:
+    """每年一个PNG文件：<output_filename>_<年份>.png"""
+
+    def __init__(self, output_filename):
+        self.output_filename = output_filename
+        self.outputs = []
+
+    def write(self, year, data):
+        path = f"{self.output_filename}_{year}.png"
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.outputs.append(path)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class ZipSink:
+    """所有年份写入同一个ZIP包（PNG已压缩，按存储方式写入）"""
+
+    def __init__(self, path, prefix):
+        self.path = path
+        self.prefix = prefix
+        self.outputs = [path]
+        self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+
+    def write(self, year, data):
+        self._zip.writestr(f"{self.prefix}_{year}.png", data)
+
+    def close(self):
+        self._zip.close()
+
+    def abort(self):
+        self._zip.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SpriteSheetSink:
+    """所有年份缩小后拼成一张图，并在同名 .json 中记录每年所在的区域 [x, y, 宽, 高]
+
+    count 为图片总数：整张拼图在写入第一张时按第一张的比例一次分配，之后每张缩小后立即贴入，
+    内存中只有拼图本身，不保留各年的图片。
+    """
+
+    def __init__(self, path, count, columns=10, tile_width=300):
+        self.path = path
+        self.count = count
+        self.columns = max(min(columns, count), 1)
+        self.tile_width = tile_width
+        self.index_path = f"{os.path.splitext(path)[0]}.json"
+        self.outputs = [path, self.index_path]
+        self._sheet = None
+        self._tile_height = None
+        self._index = {}
+
+    def write(self, year, data):
+        image = Image.open(io.BytesIO(data)).convert('RGB')
+        if self._sheet is None:
+            self._tile_height = round(image.height * self.tile_width / image.width)
+            rows = -(-self.count // self.columns)
+            self._sheet = Image.new('RGB', (self.columns * self.tile_width, rows * self._tile_height), 'white')
+        i = len(self._index)
+        x, y = (i % self.columns) * self.tile_width, (i // self.columns) * self._tile_height
+        self._sheet.paste(image.resize((self.tile_width, self._tile_height), Image.Resampling.LANCZOS), (x, y))
+        self._index[str(year)] = [x, y, self.tile_width, self._tile_height]
+
+    def close(self):
+        if self._sheet is None:
+            return
+        self._sheet.save(self.path)
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+
+    def abort(self):
+        self._sheet = None
+        self._index = {}
+
+
+class MemorySink:
+    """保留在内存中：images 为 {年份: PNG字节}"""
+
+    def __init__(self):
+        self.images = {}
+        self.outputs = []
+
+    def write(self, year, data):
+        self.images[year] = data
+
+    def close(self):
+        pass
+
+    def abort(self):
+        self.images = {}
+
+
+def open_sink(snapshot_format, output_filename, count):
+    """按格式创建输出目标：png 为逐年PNG文件，zip 为 <名称>_years.zip，sprite 为 <名称>_sprite.png
+
+    count 为将要写入的图片数（拼图据此预先分配）。
+    """
+    directory = os.path.dirname(output_filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if snapshot_format == 'png':
+        return PngFilesSink(output_filename)
+    if snapshot_format == 'zip':
+        return ZipSink(f"{output_filename}_years.zip", os.path.basename(output_filename))
+    if snapshot_format == 'sprite':
+        return SpriteSheetSink(f"{output_filename}_sprite.png", count)
+    raise ValueError(f"不支持的快照格式: {snapshot_format}（可选: {', '.join(SNAPSHOT_FORMATS)}）")
+
+
+def export_snapshots(top, title, sink, progress, workers=1, queue_size=32):
+    """渲染 TopNIndex 中的每一年并写入 sink，返回 sink.outputs
+
+    渲染在调用线程（及进程池）中进行，写入由单独的线程完成，两者之间是容量为 queue_size 的队列。
+    progress(时期的显示文字, 已完成数, 总数) 在每年渲染完成后调用，抛出异常即可中止导出。
+    """
+    pending = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    def write_loop():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            if errors:
+                continue
+            try:
+                sink.write(*item)
+            except Exception as e:
+                errors.append(e)
+
+    writer = threading.Thread(target=write_loop, daemon=True)
+    writer.start()
+    snapshots = iter_snapshots(top, title, workers)
+    try:
+        for i, (year, data) in enumerate(snapshots):
+            if errors:
+                break
+            progress(top.labels[i], i, len(top))
+            pending.put((year, data))
+    except BaseException:
+        # 先关闭进程池，再等待写入线程结束
+        snapshots.close()
+        pending.put(None)
+        writer.join()
+        sink.abort()
+        raise
+
+    pending.put(None)
+    writer.join()
+    if errors:
+        sink.abort()
+        raise errors[0]
+    sink.close()
+    return sink.outputs
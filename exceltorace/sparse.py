@@ -0,0 +1,103 @@
+"""长格式数据的稀疏表示，代替 year × country 的稠密透视表
+
+只保存实际出现的 (时期, 实体, 数值) 单元格：实体为整数编码（int32），数值为 float32，
+按 (时期, 数值降序, 实体) 排好序并记录每个时期的起止位置。内存与非空单元格数成正比，
+与时期数 × 实体总数无关。排名与对稠密透视表 fillna(0) 后稳定排序的结果完全一致，
+缺失的单元格按数值 0 参与排名。
+"""
+import numpy as np
+import pandas as pd
+
+
+class SparseFrame:
+    """按时期排序的长格式数据；index 为时期，columns 为实体名（与 pivot_frame 的行列一致）"""
+
+    def __init__(self, index, columns, period, codes, values):
+        self.index = index
+        self.columns = columns
+        self.n_entities = len(columns)
+
+        # 按 (时期, 数值降序, 实体) 排序，数值用原始精度排序后再转为 float32
+        order = np.lexsort((codes, -values, period))
+        period = period[order]
+        self.codes = codes[order].astype(np.int32)
+        self.values = values[order].astype(np.float32)
+        self.offsets = np.searchsorted(period, np.arange(len(index) + 1))
+
+        # 同一时期内按实体编码排序的位置，用于按实体查找单元格
+        self._by_code = np.lexsort((self.codes, period))
+        self._sorted_codes = self.codes[self._by_code]
+        if len(self._sorted_codes) > 1:
+            same = (np.diff(self._sorted_codes) == 0) & (np.diff(period[self._by_code]) == 0)
+            if same.any():
+                raise ValueError("存在重复的 (年份, 类别) 组合，无法生成动画")
+
+        # 每个时期内正数、0、负数依次排列：记录各时期正数和0的个数，
+        # 以及按实体编码顺序累计的0的个数（用于计算缺失实体的排名）
+        sign = np.sign(values[order])
+        positive = np.concatenate([[0], np.cumsum(sign > 0)])
+        zeros = np.concatenate([[0], np.cumsum(sign == 0)])
+        self.n_positive = positive[self.offsets[1:]] - positive[self.offsets[:-1]]
+        self.n_zero = zeros[self.offsets[1:]] - zeros[self.offsets[:-1]]
+        self.n_present = np.diff(self.offsets)
+        self._zeros_before = np.concatenate([[0], np.cumsum(sign[self._by_code] == 0)])
+
+    @classmethod
+    def from_long(cls, df):
+        """由清洗后的长格式数据（year/country/gdp）构建"""
+        country = df['country']
+        if not isinstance(country.dtype, pd.CategoricalDtype):
+            country = country.astype('category')
+        # 只保留实际出现的类别，顺序与透视表的列一致
+        country = country.cat.remove_unused_categories()
+        index, period = np.unique(df['year'].to_numpy(), return_inverse=True)
+        return cls(pd.Index(index, name='year'), pd.Index(country.cat.categories, name='country'),
+                   period, country.cat.codes.to_numpy().astype(np.int32),
+                   df['gdp'].to_numpy(dtype=float))
+
+    @property
+    def shape(self):
+        return len(self.index), self.n_entities
+
+    @property
+    def nbytes(self):
+        arrays = sum(a.nbytes for a in (self.codes, self.values, self.offsets, self._by_code, self._sorted_codes,
+                                        self._zeros_before, self.n_positive, self.n_zero, self.n_present))
+        return arrays + self.index.memory_usage(deep=True) + self.columns.memory_usage(deep=True)
+
+    def lookup(self, k, codes):
+        """第 k 个时期中给定实体的 (数值, 排名)；缺失的实体数值为0"""
+        codes = np.asarray(codes, dtype=np.int64)
+        start, stop = self.offsets[k], self.offsets[k + 1]
+        sorted_codes = self._sorted_codes[start:stop]
+        pos = np.searchsorted(sorted_codes, codes)
+        found = np.zeros(len(codes), dtype=bool)
+        inside = pos < len(sorted_codes)
+        found[inside] = sorted_codes[pos[inside]] == codes[inside]
+
+        # 出现的实体：在本时期排好序的单元格中的位置
+        base = np.zeros(len(codes), dtype=np.int64)
+        base[found] = self._by_code[start + pos[found]] - start
+        values = np.zeros(len(codes), dtype=self.values.dtype)
+        values[found] = self.values[start + base[found]]
+
+        # 数值为0或缺失的实体排在正数之后，彼此之间按实体编码排序（与 fillna(0) 后稳定排序一致）
+        zeros_before = self._zeros_before[start + pos] - self._zeros_before[start]
+        ranks = self.n_positive[k] + zeros_before + (codes - pos)
+        positive = found & (base < self.n_positive[k])
+        negative = found & (base >= self.n_positive[k] + self.n_zero[k])
+        ranks[positive] = base[positive]
+        # 负数排在所有缺失的实体之后
+        ranks[negative] = base[negative] + (self.n_entities - self.n_present[k])
+        return values, ranks
+
+    def top(self, k, keep):
+        """第 k 个时期排名前 keep 的实体编码"""
+        start = self.offsets[k]
+        candidates = self.codes[start:start + keep]
+        if self.n_positive[k] < keep:
+            # 正数不足 keep 个时，数值为0或缺失的实体按编码顺序补上
+            extra = np.arange(min(self.n_entities, keep + self.n_present[k]), dtype=np.int32)
+            candidates = np.union1d(candidates, extra)
+        _, ranks = self.lookup(k, candidates)
+        return candidates[ranks < keep]
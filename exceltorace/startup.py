@@ -0,0 +1,68 @@
+"""图形界面的快速启动
+
+界面脚本在顶层只导入 tkinter 和本模块等轻量模块，先创建并显示窗口；
+pandas、matplotlib、PIL 等渲染所需的模块和中文字体由 Warmup 在后台线程中预先加载，
+渲染任务开始前调用 wait() 确保加载完成。从导入本模块到窗口第一次可以响应操作的时间
+（启动到可交互）和后台加载的耗时记录在 Warmup.profile 中，可显示在状态栏或追加到性能日志。
+"""
+import importlib
+import threading
+import time
+
+from .profiling import Profiler, peak_rss_mb
+
+# 导入本模块的时刻，作为启动计时的起点
+LAUNCHED = time.perf_counter()
+
+# 后台预先导入的模块（按依赖顺序）
+WARMUP_MODULES = ('numpy', 'pandas', 'matplotlib.pyplot', 'PIL.ImageTk', 'exceltorace.render')
+
+
+class Warmup:
+    """在后台线程中预先导入渲染模块并设置中文字体"""
+
+    def __init__(self, modules=WARMUP_MODULES):
+        self.modules = modules
+        self.font = None
+        self.error = None
+        self.interactive = None
+        self.profile = Profiler()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            with self.profile.stage('warmup'):
+                for name in self.modules:
+                    importlib.import_module(name)
+                from .fonts import setup_fonts
+                self.font = setup_fonts()
+        except Exception as e:
+            # 真正用到这些模块时会再次报错，这里只记录
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """等待后台加载完成，返回是否已完成"""
+        return self._done.wait(timeout)
+
+    def mark_interactive(self, root, callback=None):
+        """在窗口第一次空闲（已绘制完成、可以响应操作）时记录启动耗时，并调用 callback(秒数)"""
+        def ready():
+            self.interactive = time.perf_counter() - LAUNCHED
+            self.profile.stages.insert(0, {
+                'stage': 'startup',
+                'wall': round(self.interactive, 4),
+                'cpu': round(time.process_time(), 4),
+                'peak_rss_mb': None if peak_rss_mb() is None else round(peak_rss_mb(), 1),
+            })
+            if callback is not None:
+                callback(self.interactive)
+
+        root.after_idle(ready)
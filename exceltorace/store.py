@@ -0,0 +1,111 @@
+"""清洗后数据的列式磁盘缓存
+
+每个数据文件旁边有一个 .<文件名>.racecache 目录，按列保存为 NumPy .npy 文件，
+读取时以内存映射方式加载，无需再次解析Excel。源文件的大小或修改时间变化后缓存自动失效。
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 2
+
+
+def cache_dir(path):
+    """数据文件对应的缓存目录"""
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f".{name}.racecache")
+
+
+def _source_info(stat, digest):
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': digest}
+
+
+def _write_json(path, obj):
+    # 先写临时文件再替换，元数据出现即代表缓存完整
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_frame(path, stat, digest, columns, frame, problems, sheets='auto'):
+    """保存清洗后的长格式数据（country 需为 category 类型），sheets 为读取时的工作表处理方式"""
+    directory = cache_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    for name in ('meta.json', 'pivot.json'):
+        if os.path.exists(os.path.join(directory, name)):
+            os.remove(os.path.join(directory, name))
+
+    np.save(os.path.join(directory, 'year.npy'), frame['year'].to_numpy())
+    np.save(os.path.join(directory, 'country.npy'), frame['country'].cat.codes.to_numpy())
+    np.save(os.path.join(directory, 'gdp.npy'), frame['gdp'].to_numpy())
+
+    _write_json(os.path.join(directory, 'meta.json'), {
+        'version': FORMAT_VERSION,
+        'source': _source_info(stat, digest),
+        'columns': list(columns),
+        'problems': list(problems),
+        'sheets': sheets,
+        'categories': frame['country'].cat.categories.tolist(),
+    })
+
+
+def load_frame(path, stat, sheets='auto'):
+    """读取缓存，返回 (sha1, 原始列名, 长格式数据, 问题列表)；缓存缺失、过期或工作表处理方式不同时返回 None"""
+    directory = cache_dir(path)
+    meta = _read_json(os.path.join(directory, 'meta.json'))
+    if not meta or meta.get('version') != FORMAT_VERSION or meta.get('sheets') != sheets:
+        return None
+    source = meta['source']
+    if source['size'] != stat.st_size or source['mtime_ns'] != stat.st_mtime_ns:
+        return None
+
+    try:
+        year = np.load(os.path.join(directory, 'year.npy'), mmap_mode='r')
+        codes = np.load(os.path.join(directory, 'country.npy'), mmap_mode='r')
+        gdp = np.load(os.path.join(directory, 'gdp.npy'), mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    frame = pd.DataFrame({
+        'year': year,
+        'country': pd.Categorical.from_codes(codes, meta['categories']),
+        'gdp': gdp,
+    }, copy=False)
+    return source['sha1'], meta['columns'], frame, meta['problems']
+
+
+def save_pivot(path, digest, df_pivot):
+    """保存宽格式透视表（year × country）；时期索引另存为 .npy，日期等类型原样保留"""
+    directory = cache_dir(path)
+    np.save(os.path.join(directory, 'pivot.npy'), df_pivot.to_numpy())
+    np.save(os.path.join(directory, 'pivot_index.npy'), df_pivot.index.to_numpy())
+    _write_json(os.path.join(directory, 'pivot.json'), {
+        'sha1': digest,
+        'columns': df_pivot.columns.tolist(),
+    })
+
+
+def load_pivot(path, digest):
+    """读取透视表缓存，缺失或与源数据不符时返回 None"""
+    directory = cache_dir(path)
+    meta = _read_json(os.path.join(directory, 'pivot.json'))
+    if not meta or meta.get('sha1') != digest:
+        return None
+    try:
+        values = np.load(os.path.join(directory, 'pivot.npy'), mmap_mode='r')
+        index = np.load(os.path.join(directory, 'pivot_index.npy'))
+    except (OSError, ValueError):
+        return None
+    return pd.DataFrame(values, index=pd.Index(index, name='year'),
+                        columns=pd.Index(meta['columns'], name='country'), copy=False)
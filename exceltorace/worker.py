@@ -0,0 +1,110 @@
+"""后台渲染线程：任务排队执行，通过事件队列回报进度，可随时取消"""
+import itertools
+import queue
+import threading
+
+
+class RenderCancelled(Exception):
+    """渲染任务被取消"""
+
+
+class RenderJob:
+    """一个排队中的渲染任务"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name, func):
+        self.id = next(self._ids)
+        self.name = name
+        self.func = func
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+class RenderWorker:
+    """在单独线程中依次执行渲染任务
+
+    任务函数以 report(message, value=None) 为唯一参数；每次调用 report 都会把进度
+    放入 events 队列，并在任务被取消时抛出 RenderCancelled 以中止渲染。
+    events 中的事件为 (类型, 任务, 数据) 元组，类型为 'started'、'progress'、
+    'done'、'error' 或 'cancelled'，由界面线程（如 root.after）轮询读取。
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = []
+        self.current = None
+        self._thread = threading.Thread(target=self._run, name="render-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, name, func):
+        """加入一个渲染任务，返回 RenderJob"""
+        job = RenderJob(name, func)
+        with self._lock:
+            self._pending.append(job)
+        self._jobs.put(job)
+        return job
+
+    def cancel(self, job=None):
+        """取消指定任务；未指定时取消正在执行的任务"""
+        job = job or self.current
+        if job is not None:
+            job.cancel()
+        return job
+
+    def cancel_all(self):
+        """取消正在执行和排队中的全部任务，返回取消的任务数"""
+        with self._lock:
+            jobs = list(self._pending)
+            if self.current is not None:
+                jobs.append(self.current)
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    @property
+    def pending(self):
+        """排队中（尚未开始）的任务数"""
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            # 出队和成为当前任务在同一把锁内完成，cancel_all 不会漏掉刚出队的任务
+            with self._lock:
+                self._pending.remove(job)
+                self.current = job
+            if job.cancelled:
+                self.current = None
+                self.events.put(('cancelled', job, None))
+                continue
+
+            self.events.put(('started', job, None))
+
+            def report(message, value=None, job=job):
+                if job.cancelled:
+                    raise RenderCancelled()
+                self.events.put(('progress', job, (message, value)))
+
+            try:
+                result = job.func(report)
+            except RenderCancelled:
+                self.events.put(('cancelled', job, None))
+            except Exception as e:
+                self.events.put(('error', job, e))
+            else:
+                if job.cancelled:
+                    self.events.put(('cancelled', job, None))
+                else:
+                    self.events.put(('done', job, result))
+            finally:
+                self.current = None
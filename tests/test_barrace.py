@@ -0,0 +1,39 @@
+"""内置动画引擎的回归测试"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from exceltorace.barrace import PeriodLabel, _frame_schedule, interpolate_top_n, period_times
+from exceltorace.sparse import SparseFrame
+
+
+def _sparse(periods, n_entities=3):
+    rows = [(period, f"E{j}", float(i * n_entities + j + 1))
+            for i, period in enumerate(periods) for j in range(n_entities)]
+    df = pd.DataFrame(rows, columns=['year', 'country', 'gdp'])
+    df['country'] = df['country'].astype('category')
+    return SparseFrame.from_long(df)
+
+
+@pytest.mark.parametrize('steps', [1, 4, 12, 30])
+def test_every_month_is_labelled(steps):
+    months = pd.date_range('2020-01-01', periods=12, freq='MS')
+    sparse = _sparse(months)
+    times, _, _, _ = interpolate_top_n(sparse, 3, steps)
+    label = PeriodLabel(sparse.index)
+    labels = [label(t) for t in times]
+    assert set(labels) == {f"2020年{m}月" for m in range(1, 13)}
+    # 标签按时间顺序出现，不会回退
+    assert labels == sorted(labels, key=lambda text: int(text[5:-1]))
+
+
+def test_uniform_years_keep_the_uniform_schedule():
+    times = period_times(pd.Index([2000, 2001, 2002, 2005]))
+    frame_times, _, _, _ = _frame_schedule(times, 2, 'linear', False)
+    assert np.allclose(frame_times, np.linspace(2000, 2005, 11))
+
+
+def test_uneven_periods_fall_back_to_per_period():
+    times = np.array([2000.0, 2000.25, 2003.0])
+    frame_times, _, _, _ = _frame_schedule(times, 1, 'linear', False)
+    assert set(times) <= set(frame_times)
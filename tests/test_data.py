@@ -0,0 +1,68 @@
+"""数据读取与清洗的回归测试"""
+import pandas as pd
+
+from exceltorace import data
+
+
+def _load(tmp_path, text):
+    path = tmp_path / "data.csv"
+    path.write_text(text, encoding='utf-8')
+    return data.WorkbookCache(persist=False).get(str(path))
+
+
+def test_blank_category_does_not_merge_into_other_entity(tmp_path):
+    entry = _load(tmp_path, "year,country,gdp\n2000,a,1\n2000,b,2\n2001,a,3\n2001,b,4\n2001,,100\n")
+    frame, merged = data.aggregate_frame(entry.frame)
+    assert merged == 0
+    values = {(int(row.year), row.country): row.gdp for row in frame.itertuples()}
+    assert values == {(2000, 'a'): 1, (2000, 'b'): 2, (2001, 'a'): 3, (2001, 'b'): 4}
+    assert any("类别" in problem and "1 个空值" in problem for problem in entry.problems)
+
+
+def test_aggregate_ignores_blank_category_rows():
+    df = pd.DataFrame({'year': [2000, 2000, 2001, 2001], 'country': ['a', 'b', None, 'a'],
+                       'gdp': [1.0, 2.0, 100.0, 3.0]})
+    df['country'] = df['country'].astype('category')
+    frame, merged = data.aggregate_frame(pd.concat([df, df.iloc[[3]]], ignore_index=True))
+    assert merged == 1
+    values = {(int(row.year), row.country): row.gdp for row in frame.itertuples()}
+    assert values == {(2000, 'a'): 1, (2000, 'b'): 2, (2001, 'a'): 6}
+
+
+def test_file_without_valid_rows_is_rejected(tmp_path):
+    entry = _load(tmp_path, "国家,2005,2010\n美国,1,2\n中国,3,4\n")
+    assert entry.frame is None
+    assert entry.error == data.NO_VALID_ROWS
+    valid, _ = data.validate_file(str(tmp_path / "data.csv"), cache=data.WorkbookCache(persist=False))
+    assert not valid
+
+
+def test_fractional_and_date_times_are_kept(tmp_path):
+    entry = _load(tmp_path, "t,c,v\n2020,a,1\n2020.25,a,2\n2020.5,a,3\n")
+    assert sorted(entry.frame['year'].tolist()) == [2020.0, 2020.25, 2020.5]
+    assert data.TopNIndex(entry.frame, 15).labels == ['2020', '2020.25', '2020.5']
+
+    entry = _load(tmp_path, "t,c,v\n2020-01-01,a,1\n2020-04-01,a,2\n2020-07-01,a,3\n")
+    assert entry.frame['year'].dtype.kind == 'M'
+    assert data.TopNIndex(entry.frame, 15).labels == ['2020年第1季度', '2020年第2季度', '2020年第3季度']
+
+
+def test_memoized_structures_count_towards_cache_limit(tmp_path):
+    paths = []
+    for name in ("a.csv", "b.csv"):
+        path = tmp_path / name
+        path.write_text("year,country,gdp\n" + "".join(f"{2000 + i},c{i % 7},{i}\n" for i in range(50)),
+                        encoding='utf-8')
+        paths.append(str(path))
+    cache = data.WorkbookCache(persist=False)
+    first, second = (cache.get(path) for path in paths)
+    base = first.nbytes
+    first.pivot()
+    first.sparse()
+    assert first.nbytes > base
+    assert cache.nbytes == first.nbytes + second.nbytes
+
+    cache.max_bytes = first.nbytes + second.nbytes
+    second.sparse()
+    assert len(cache) == 1
+    assert cache.peek(paths[1]) is second
@@ -0,0 +1,54 @@
+"""GIF编码器的测试"""
+import numpy as np
+from PIL import Image
+
+from exceltorace.encoders import GifWriter, open_writer
+
+SIZE = (16, 12)
+COLORS = np.array([[255, 255, 255], [200, 30, 30], [30, 30, 200], [20, 160, 60]], dtype=np.uint8)
+
+
+def _frame(bar):
+    """白底上一条长度为 bar 的条形，颜色数少于调色板，量化无损"""
+    frame = np.full((SIZE[1], SIZE[0], 4), 255, dtype=np.uint8)
+    frame[2:5, :bar, :3] = COLORS[1]
+    frame[6:9, :SIZE[0] - bar, :3] = COLORS[2]
+    frame[10:, :3, :3] = COLORS[3]
+    return frame
+
+
+def _decode(path):
+    with Image.open(path) as image:
+        frames, durations = [], []
+        for i in range(image.n_frames):
+            image.seek(i)
+            frames.append(np.asarray(image.convert('RGB')))
+            durations.append(image.info['duration'])
+    return frames, durations
+
+
+def test_frames_round_trip_and_repeats_are_merged(tmp_path):
+    path = str(tmp_path / "out.gif")
+    bars = [2, 5, 5, 5, 9, 14]
+    frames = [_frame(bar) for bar in bars]
+    with open_writer(path, 10, SIZE, palette_frames=frames) as writer:
+        assert isinstance(writer, GifWriter)
+        for frame in frames:
+            writer.write(frame)
+
+    decoded, durations = _decode(path)
+    expected = [_frame(bar)[:, :, :3] for bar in (2, 5, 9, 14)]
+    assert len(decoded) == len(expected)
+    assert all(np.array_equal(a, b) for a, b in zip(decoded, expected))
+    # 重复的两帧并入前一帧的显示时间
+    assert durations == [100, 300, 100, 100]
+    assert "6 帧合并为 4 帧" in writer.summary
+    assert "PSNR inf dB" in writer.summary
+
+
+def test_abort_removes_partial_file(tmp_path):
+    path = tmp_path / "out.gif"
+    writer = GifWriter(str(path), 10, SIZE)
+    writer.write(_frame(3))
+    writer.abort()
+    assert not path.exists()
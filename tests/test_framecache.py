@@ -0,0 +1,102 @@
+"""帧缓存的回归测试"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from exceltorace.barrace import BarRace, nice_ceiling
+from exceltorace.framecache import FrameCache
+
+SHAPE = (4, 5, 4)
+
+
+def _frames(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, SHAPE, dtype=np.uint8) for _ in range(n)]
+
+
+def test_segment_round_trip(tmp_path):
+    cache = FrameCache(str(tmp_path))
+    frames = _frames(3)
+    writer = cache.open_segment('k')
+    for frame in frames:
+        writer.write(frame)
+    writer.close()
+    assert 'k' in cache
+    loaded = list(cache.load('k', SHAPE))
+    assert len(loaded) == 3
+    assert all(np.array_equal(a, b) for a, b in zip(frames, loaded))
+
+
+def test_aborted_segment_leaves_no_entry(tmp_path):
+    cache = FrameCache(str(tmp_path))
+    writer = cache.open_segment('k')
+    writer.write(_frames(1)[0])
+    writer.abort()
+    assert 'k' not in cache
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_truncated_segment_stops_early_and_is_pruned(tmp_path):
+    cache = FrameCache(str(tmp_path))
+    writer = cache.open_segment('k')
+    for frame in _frames(3):
+        writer.write(frame)
+    writer.close()
+    path = tmp_path / 'k.bin'
+    path.write_bytes(path.read_bytes()[:-20])
+
+    cache = FrameCache(str(tmp_path))
+    assert len(list(cache.load('k', SHAPE))) < 3
+    cache.prune()
+    assert 'k' not in cache
+
+
+def _race(rows):
+    df = pd.DataFrame(rows, columns=['year', 'country', 'gdp'])
+    df['country'] = df['country'].astype('category')
+    pivot = df.pivot(index='year', columns='country', values='gdp')
+    return BarRace(pivot, "测试", n_bars=5, steps_per_unit=2, figsize=(3, 2), dpi=40)
+
+
+def _render(race, directory):
+    cache = FrameCache(str(directory))
+    frames = [frame.copy() for frame in race.frames(cache=cache)]
+    return cache, frames
+
+
+@pytest.fixture
+def rows():
+    names = [f"E{i}" for i in range(6)]
+    return [(year, name, (i + 1) * 100 * 1.1 ** (year - 2000))
+            for year in range(2000, 2006) for i, name in enumerate(names)]
+
+
+@pytest.mark.filterwarnings('ignore::UserWarning')
+def test_appending_a_year_reuses_earlier_segments(tmp_path, rows):
+    _render(_race(rows), tmp_path)
+    # 新的一年创出新高，坐标轴上限取整后不变
+    grown = rows + [(2006, f"E{i}", (i + 1) * 100 * 1.1 ** 6) for i in range(6)]
+    race = _race(grown)
+    cache, frames = _render(race, tmp_path)
+    # 只有原来的最后一段（含结束帧）和新的一段需要重新绘制
+    assert cache.hits == len(race) - 5
+    fresh = [frame.copy() for frame in race.frames()]
+    assert all(np.array_equal(a, b) for a, b in zip(frames, fresh))
+
+
+@pytest.mark.filterwarnings('ignore::UserWarning')
+def test_new_entity_does_not_recolor_existing_bars(tmp_path, rows):
+    race = _race(rows)
+    _render(race, tmp_path)
+    # 'AAA' 排在最前面，其他实体的编码都会改变
+    extended = _race(rows + [(year, 'AAA', 1.0) for year in range(2000, 2006)])
+    assert extended.colors[1:] == race.colors
+    cache, _ = _render(extended, tmp_path)
+    assert cache.hits == len(extended)
+
+
+def test_nice_ceiling():
+    assert nice_ceiling(99) == 100
+    assert nice_ceiling(101) == 150
+    assert nice_ceiling(5100) == 6000
+    assert nice_ceiling(0) == 1.0
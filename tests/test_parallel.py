@@ -0,0 +1,12 @@
+"""进程池辅助函数的测试"""
+from exceltorace.parallel import imap_bounded
+
+
+def test_imap_bounded_keeps_submission_order():
+    assert list(imap_bounded(pow, [(2, i) for i in range(20)], 2)) == [2 ** i for i in range(20)]
+
+
+def test_imap_bounded_can_be_closed_early():
+    results = imap_bounded(pow, [(3, i) for i in range(50)], 2)
+    assert next(results) == 1
+    results.close()
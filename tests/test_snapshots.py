@@ -0,0 +1,31 @@
+"""快照输出目标的测试"""
+import io
+import json
+
+from PIL import Image
+
+from exceltorace.snapshots import SpriteSheetSink
+
+
+def _png(color, size=(60, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='png')
+    return buffer.getvalue()
+
+
+def test_sprite_sheet_places_tiles_as_they_arrive(tmp_path):
+    path = tmp_path / "s_sprite.png"
+    colors = ['red', 'green', 'blue', 'black', 'yellow']
+    sink = SpriteSheetSink(str(path), len(colors), columns=2, tile_width=30)
+    for year, color in zip(range(2000, 2005), colors):
+        sink.write(str(year), _png(color))
+    sink.close()
+
+    index = json.loads((tmp_path / "s_sprite.json").read_text(encoding='utf-8'))
+    assert index['2000'] == [0, 0, 30, 20]
+    assert index['2003'] == [30, 20, 30, 20]
+    assert index['2004'] == [0, 40, 30, 20]
+    with Image.open(path) as sheet:
+        assert sheet.size == (60, 60)
+        assert sheet.getpixel((45, 30)) == (0, 0, 0)
+        assert sheet.getpixel((15, 50)) == (255, 255, 0)
@@ -0,0 +1,58 @@
+"""稀疏表示的排名与稠密透视表一致性的测试"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from exceltorace.barrace import _period_ranks
+from exceltorace.data import pivot_frame
+from exceltorace.sparse import SparseFrame
+
+
+def _random_long(seed, n_periods=6, n_entities=12):
+    """带缺失、0、负数和并列数值的长格式数据"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for year in range(2000, 2000 + n_periods):
+        for code in range(n_entities):
+            kind = rng.integers(0, 5)
+            if kind == 0:
+                continue  # 缺失
+            value = {1: 0.0, 2: -float(rng.integers(1, 4)), 3: float(rng.integers(1, 4))}.get(
+                kind, float(rng.uniform(1, 100)))
+            rows.append((year, f"E{code:02d}", value))
+    df = pd.DataFrame(rows, columns=['year', 'country', 'gdp'])
+    df['country'] = df['country'].astype('category')
+    return df
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_lookup_matches_dense_ranks(seed):
+    df = _random_long(seed)
+    pivot = pivot_frame(df)
+    sparse = SparseFrame.from_long(df)
+    assert list(sparse.index) == list(pivot.index)
+    assert list(sparse.columns) == list(pivot.columns)
+
+    values = pivot.to_numpy(dtype=float)
+    _, ranks = _period_ranks(values)
+    codes = np.arange(sparse.n_entities)
+    for k in range(len(sparse.index)):
+        found_values, found_ranks = sparse.lookup(k, codes)
+        assert np.array_equal(found_values, values[k].astype(np.float32))
+        assert np.array_equal(found_ranks, ranks[k])
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('keep', [1, 3, 8, 12])
+def test_top_matches_dense_order(seed, keep):
+    df = _random_long(seed)
+    sparse = SparseFrame.from_long(df)
+    order, _ = _period_ranks(pivot_frame(df).to_numpy(dtype=float))
+    for k in range(len(sparse.index)):
+        assert sorted(sparse.top(k, keep).tolist()) == sorted(order[k, :keep].tolist())
+
+
+def test_duplicate_cells_are_rejected():
+    df = pd.DataFrame({'year': [2000, 2000], 'country': ['a', 'a'], 'gdp': [1.0, 2.0]})
+    with pytest.raises(ValueError):
+        SparseFrame.from_long(df)
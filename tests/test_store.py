@@ -0,0 +1,34 @@
+"""磁盘缓存的回归测试"""
+import pandas as pd
+
+from exceltorace import data
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "data.csv"
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def _assert_same_pivot(cached, expected):
+    pd.testing.assert_index_equal(cached.index, expected.index)
+    assert cached.columns.tolist() == expected.columns.tolist()
+    assert (cached.to_numpy() == expected.to_numpy()).all()
+
+
+def test_cached_pivot_keeps_date_index(tmp_path):
+    path = _write(tmp_path, "t,c,v\n2020-01-01,a,1\n2020-02-01,a,2\n2020-02-01,b,3\n")
+    expected = data.WorkbookCache().get(path).pivot()
+    assert isinstance(expected.index, pd.DatetimeIndex)
+
+    # 新的进程内缓存从磁盘读取清洗结果和透视表
+    cached = data.WorkbookCache().get(path).pivot()
+    _assert_same_pivot(cached, expected)
+
+
+def test_cached_pivot_keeps_integer_years(tmp_path):
+    path = _write(tmp_path, "year,country,gdp\n2000,a,1\n2001,a,2\n2001,b,3\n")
+    expected = data.WorkbookCache().get(path).pivot()
+    cached = data.WorkbookCache().get(path).pivot()
+    _assert_same_pivot(cached, expected)
+    assert data.period_labels(cached.index) == ['2000年', '2001年']
@@ -0,0 +1,58 @@
+"""后台渲染线程的取消测试"""
+import threading
+
+from exceltorace.worker import RenderWorker
+
+
+def _events(worker, count, timeout=5):
+    return [worker.events.get(timeout=timeout) for _ in range(count)]
+
+
+def _blocking_job(started, release):
+    def run(report):
+        started.set()
+        while not release.wait(0.01):
+            report("运行中")
+        return 'ok'
+    return run
+
+
+def test_completed_job_reports_result():
+    worker = RenderWorker()
+    job = worker.submit('a', lambda report: report("进度", 50) or 'done')
+    kinds = [(kind, payload) for kind, _, payload in _events(worker, 3)]
+    assert kinds == [('started', None), ('progress', ("进度", 50)), ('done', 'done')]
+    assert not job.cancelled
+
+
+def test_cancel_stops_running_job():
+    worker = RenderWorker()
+    started, release = threading.Event(), threading.Event()
+    job = worker.submit('a', _blocking_job(started, release))
+    assert started.wait(5)
+    assert worker.cancel() is job
+    events = [worker.events.get(timeout=5)]
+    while events[-1][0] in ('started', 'progress'):
+        events.append(worker.events.get(timeout=5))
+    assert events[0][0] == 'started'
+    assert events[-1][:2] == ('cancelled', job)
+
+
+def test_cancel_all_cancels_running_and_queued_jobs():
+    worker = RenderWorker()
+    started, release = threading.Event(), threading.Event()
+    jobs = [worker.submit('a', _blocking_job(started, release))]
+    ran = []
+    jobs += [worker.submit(name, lambda report, name=name: ran.append(name)) for name in 'bc']
+    assert started.wait(5)
+    assert worker.cancel_all() == 3
+
+    finished = {}
+    while len(finished) < 3:
+        kind, job, _ = worker.events.get(timeout=5)
+        if kind not in ('started', 'progress'):
+            finished[job.id] = kind
+    assert finished == {job.id: 'cancelled' for job in jobs}
+    assert ran == []
+    assert worker.pending == 0
+    assert worker.cancel_all() == 0